@@ -0,0 +1,150 @@
+import copy
+import hashlib
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+from .metrics import registry
+
+# Счётчики и флаг рассылки меняются запросами UPDATE в обход экземпляра,
+# поэтому в кэш пользователь попадает без них: обращение к ним читает
+# свежие значения, а save() не перезапишет их устаревшими.
+DEFERRED_FIELDS = (
+    "user__recipes_count",
+    "user__followers_count",
+    "user__feed_fanned_out",
+)
+
+
+def make_key(key):
+    return f"auth:token:{hashlib.sha256(key.encode()).hexdigest()}"
+
+
+class LocalTokenCache:
+    """Токены в памяти процесса: не больше size записей, каждая живёт
+    timeout секунд, давно не использованные вытесняются первыми.
+
+    Запись хранит поколение токена из кэша Django и действительна, пока
+    оно не сменилось. delete() удаляет поколение, поэтому сброс в одном
+    воркере виден остальным при следующем обращении к токену.
+    """
+
+    def __init__(self, size, timeout):
+        self.size = size
+        self.timeout = timeout
+        self.entries = OrderedDict()
+        self.lock = Lock()
+
+    def make_key(self, key):
+        return f"{make_key(key)}:generation"
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            token, generation, expires = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+        if cache.get(self.make_key(key)) != generation:
+            self.forget(key)
+            return None
+        return token
+
+    def load(self, key, get_token):
+        # Поколение читается до запроса к базе: если токен сбросят, пока
+        # он загружается, запись сразу окажется устаревшей.
+        generation = cache.get_or_set(
+            self.make_key(key), time.time_ns, self.timeout
+        )
+        token = get_token(key)
+        with self.lock:
+            self.entries[key] = (
+                token,
+                generation,
+                time.monotonic() + self.timeout,
+            )
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+        return token
+
+    def forget(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def delete(self, key):
+        self.forget(key)
+        cache.delete(self.make_key(key))
+
+
+class SharedTokenCache:
+    """Токены в кэше Django, общем для воркеров при подключённом Redis."""
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+
+    def get(self, key):
+        return cache.get(make_key(key))
+
+    def load(self, key, get_token):
+        token = get_token(key)
+        cache.set(make_key(key), token, self.timeout)
+        return token
+
+    def delete(self, key):
+        cache.delete(make_key(key))
+
+
+if settings.AUTH_TOKEN_CACHE_SHARED:
+    token_cache = SharedTokenCache(settings.AUTH_TOKEN_CACHE_TIMEOUT)
+else:
+    token_cache = LocalTokenCache(
+        settings.AUTH_TOKEN_CACHE_SIZE, settings.AUTH_TOKEN_CACHE_TIMEOUT
+    )
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Аутентификация по токену без запроса к базе на каждый вызов API.
+
+    Токен вместе с пользователем кэшируется на AUTH_TOKEN_CACHE_TIMEOUT
+    секунд. Записи сбрасываются сигналами при выходе, удалении токена и
+    сохранении пользователя: смене пароля, блокировке.
+    """
+
+    def authenticate_credentials(self, key):
+        token = token_cache.get(key)
+        if settings.API_INSTRUMENTATION:
+            registry.increase(
+                "api_auth_cache_total",
+                (("result", "miss" if token is None else "hit"),),
+            )
+        if token is None:
+            token = token_cache.load(key, self.get_token)
+        # Каждый запрос получает свою копию, чтобы изменения request.user
+        # не попадали в общий кэш.
+        token = copy.copy(token)
+        token.user = copy.copy(token.user)
+        return token.user, token
+
+    def get_token(self, key):
+        try:
+            token = (
+                self.get_model()
+                .objects.select_related("user")
+                .defer(*DEFERRED_FIELDS)
+                .get(key=key)
+            )
+        except self.get_model().DoesNotExist:
+            raise AuthenticationFailed(_("Invalid token."))
+        if not token.user.is_active:
+            raise AuthenticationFailed(_("User inactive or deleted."))
+        return token
@@ -0,0 +1,113 @@
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag, urlencode
+from rest_framework.response import Response
+
+from .routers import read_from_primary
+
+
+def get_generation(name):
+    """Возвращает текущее поколение кэша с указанным именем."""
+    key = f"api:{name}:generation"
+    generation = cache.get(key)
+    if generation is None:
+        generation = time.time_ns()
+        cache.set(key, generation, None)
+    return generation
+
+
+def bump_generation(name):
+    """Делает недействительными все записи кэша с указанным именем."""
+    cache.set(f"api:{name}:generation", time.time_ns(), None)
+
+
+def make_key(name, request):
+    """Собирает ключ кэша для запроса в текущем поколении.
+
+    Параметры запроса сортируются, поэтому один и тот же набор
+    параметров в разном порядке попадает в одну запись.
+    """
+    query = urlencode(
+        sorted(
+            (key, value)
+            for key in request.GET
+            for value in request.GET.getlist(key)
+        )
+    )
+    path = f"{request.get_host()}{request.path}?{query}"
+    path = hashlib.md5(path.encode()).hexdigest()
+    return f"api:{name}:{get_generation(name)}:{path}"
+
+
+def make_entry(data):
+    """Готовит запись кэша с данными ответа и заголовками валидации."""
+    content = json.dumps(data, ensure_ascii=False, sort_keys=True)
+    return {
+        "data": data,
+        "etag": quote_etag(hashlib.md5(content.encode()).hexdigest()),
+        "last_modified": int(time.time()),
+    }
+
+
+def cached_response(request, entry):
+    """Возвращает 304 или ответ из записи кэша."""
+    response = Response(
+        entry["data"],
+        headers={
+            "ETag": entry["etag"],
+            "Last-Modified": http_date(entry["last_modified"]),
+        },
+    )
+    return get_conditional_response(
+        request,
+        etag=entry["etag"],
+        last_modified=entry["last_modified"],
+        response=response,
+    )
+
+
+class CachedReadOnlyMixin:
+    """Кэширует сериализованные ответы list и retrieve.
+
+    Записи хранятся в кэше Django и сбрасываются сигналами через смену
+    поколения cache_name. Локальный кэш у каждого процесса свой, поэтому
+    для нескольких воркеров стоит подключить Redis. Если ответ зависит от
+    пользователя, cache_anonymous_only включает кэш только для анонимных
+    запросов. Промах кэша читает с основной базы, а не с реплики.
+    """
+
+    cache_name = None
+    cache_anonymous_only = False
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def get_cached_response(self, handler, request, *args, **kwargs):
+        if self.cache_anonymous_only and request.user.is_authenticated:
+            return handler(request, *args, **kwargs)
+        key = make_key(self.cache_name, request)
+        entry = cache.get(key)
+        if entry is None:
+            # Запись живёт до следующего изменения, поэтому заполняется
+            # с основной базы, а не с реплики, которая может отставать.
+            with read_from_primary():
+                response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            data = response.data
+            data = list(data) if isinstance(data, list) else dict(data)
+            entry = make_entry(data)
+            cache.set(key, entry, settings.API_CACHE_TIMEOUT)
+        return cached_response(request, entry)
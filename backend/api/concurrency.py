@@ -0,0 +1,76 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+from threading import current_thread
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+from .connections import check_connections
+from .middleware import record_queries
+
+POOL_THREAD_PREFIX = "queries"
+
+# Потоки пула живут всё время работы процесса, поэтому их соединения
+# переиспользуются так же, как соединения потоков запросов.
+executor = ThreadPoolExecutor(
+    max_workers=settings.API_PARALLEL_WORKERS,
+    thread_name_prefix=POOL_THREAD_PREFIX,
+)
+
+
+def in_pool_thread():
+    return current_thread().name.startswith(POOL_THREAD_PREFIX)
+
+
+def release_connections(function):
+    """Проверяет соединения потока до вызова и закрывает устаревшие после.
+
+    Запросы функции учитываются в счётчике запроса к API.
+    """
+
+    @wraps(function)
+    def wrapper():
+        check_connections()
+        try:
+            with record_queries():
+                return function()
+        finally:
+            close_old_connections()
+
+    return wrapper
+
+
+async def gather(*functions):
+    """Выполняет синхронные функции с запросами к базе одновременно.
+
+    Каждая функция работает в потоке из общего пула со своим соединением.
+    """
+    return await asyncio.gather(
+        *(
+            sync_to_async(
+                release_connections(function),
+                thread_sensitive=False,
+                executor=executor,
+            )()
+            for function in functions
+        )
+    )
+
+
+def run_parallel(*functions):
+    """Выполняет независимые запросы к базе одновременно.
+
+    Корутина выполняется во временном цикле событий, а поток запроса
+    ждёт её завершения. Если API_PARALLEL_QUERIES выключена или вызов
+    сделан из потока пула, функции выполняются по очереди в текущем
+    потоке: вложенные задачи ждали бы свободный поток того же пула.
+    """
+    if (
+        not settings.API_PARALLEL_QUERIES
+        or len(functions) < 2
+        or in_pool_thread()
+    ):
+        return [function() for function in functions]
+    return async_to_sync(gather)(*functions)
@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.db import connections
+
+from .metrics import registry
+
+
+def check_connection(connection):
+    """Проверяет постоянное соединение перед повторным использованием.
+
+    Соединение, которое перестало отвечать (например, после перезапуска
+    базы или pgbouncer), закрывается, и Django откроет новое вместо
+    ошибки посреди обработки.
+    """
+    if connection.connection is None or connection.in_atomic_block:
+        return
+    labels = (("alias", connection.alias),)
+    if settings.API_INSTRUMENTATION:
+        registry.increase("api_db_connections_reused_total", labels)
+    if settings.DB_HEALTH_CHECKS and not connection.is_usable():
+        connection.close()
+        if settings.API_INSTRUMENTATION:
+            registry.increase("api_db_health_check_failures_total", labels)
+
+
+def check_connections():
+    """Откладывает проверку открытых соединений до их первого запроса.
+
+    Саму проверку выполняет бэкенд foodgram_backend.postgresql, поэтому
+    лишний запрос SELECT 1 достаётся только используемым соединениям.
+    """
+    for connection in connections.all():
+        if connection.connection is not None:
+            connection.health_check_pending = True
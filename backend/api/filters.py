@@ -1,7 +1,21 @@
-from django_filters.filters import ModelMultipleChoiceFilter, NumberFilter
+from django.db.models import Exists, OuterRef
+from django_filters.filters import (
+    CharFilter,
+    ChoiceFilter,
+    ModelMultipleChoiceFilter,
+    NumberFilter,
+)
 from django_filters.rest_framework import FilterSet
 
-from recipes.models import Recipe, Tag
+from recipes.models import Recipe, Tag, TagRecipe
+from recipes.search import search_recipes
+
+
+ORDERINGS = {
+    "popular": ("-favorites_count", "-id"),
+    "trending": ("-trending_score", "-id"),
+    "cooking_time": ("cooking_time", "-id"),
+}
 
 
 class RecipeFilter(FilterSet):
@@ -11,14 +25,31 @@ class RecipeFilter(FilterSet):
         field_name="tags__slug",
         to_field_name="slug",
         queryset=Tag.objects.all(),
+        method="tags_filter",
     )
     is_favorited = NumberFilter(method="is_favorited_filter")
     is_in_shopping_cart = NumberFilter(method="is_in_shopping_cart_filter")
+    search = CharFilter(method="search_filter")
+    ordering = ChoiceFilter(
+        choices=[(ordering, ordering) for ordering in ORDERINGS],
+        method="ordering_filter",
+    )
 
     class Meta:
         model = Recipe
         fields = ("author", "tags")
 
+    def tags_filter(self, queryset, name, value):
+        if not value:
+            return queryset
+        return queryset.filter(
+            Exists(
+                TagRecipe.objects.filter(
+                    recipe=OuterRef("pk"), tag__in=value
+                )
+            )
+        )
+
     def is_favorited_filter(self, queryset, name, value):
         user = self.request.user
         if user.is_authenticated:
@@ -36,3 +67,9 @@ class RecipeFilter(FilterSet):
             if value == 0:
                 return queryset.exclude(shoppingcart__user=user)
         return queryset
+
+    def search_filter(self, queryset, name, value):
+        return search_recipes(queryset, value)
+
+    def ordering_filter(self, queryset, name, value):
+        return queryset.order_by(*ORDERINGS[value])
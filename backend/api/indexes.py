@@ -0,0 +1,134 @@
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from itertools import islice
+from threading import Lock
+
+from recipes.models import Ingredient, IngredientRecipe
+
+from .cache import get_generation
+from .routers import read_from_primary
+
+
+class IngredientIndex:
+    """Индекс ингредиентов в памяти процесса для автодополнения.
+
+    Хранит отсортированные названия в нижнем регистре и ищет префикс
+    бинарным поиском. Индекс перестраивается, когда меняется поколение
+    кэша ингредиентов, то есть после любого изменения Ingredient.
+    """
+
+    def __init__(self):
+        self.index = (None, [], [])
+
+    def build(self, generation):
+        with read_from_primary():
+            ingredients = sorted(
+                (ingredient["name"].lower(), ingredient["id"], ingredient)
+                for ingredient in Ingredient.objects.values(
+                    "id", "name", "measurement_unit"
+                )
+            )
+        self.index = (
+            generation,
+            [key for key, _, _ in ingredients],
+            [ingredient for _, _, ingredient in ingredients],
+        )
+
+    def search(self, query, limit=None):
+        """Ищет ингредиенты: сначала по префиксу, затем по вхождению."""
+        generation = get_generation("ingredients")
+        if self.index[0] != generation:
+            self.build(generation)
+        _, keys, items = self.index
+        query = query.lower()
+        start = bisect_left(keys, query)
+        end = bisect_left(keys, query + chr(0x10FFFF), start)
+        if limit is not None:
+            end = min(end, start + limit)
+        results = items[start:end]
+        if limit is None or len(results) < limit:
+            contains = (
+                items[index]
+                for index, key in enumerate(keys)
+                if query in key and not key.startswith(query)
+            )
+            rest = None if limit is None else limit - len(results)
+            results.extend(islice(contains, rest))
+        return results
+
+
+ingredient_index = IngredientIndex()
+
+
+class RecipeIngredientIndex:
+    """Обратный индекс «ингредиент → рецепты» в памяти процесса.
+
+    Рецепты пронумерованы позициями, для каждого ингредиента хранится
+    компактный массив позиций рецептов, где он встречается, а для каждой
+    позиции — id рецепта и число его ингредиентов. Подбор рецептов
+    складывает массивы только выбранных ингредиентов, не обращаясь к базе.
+    Индекс перестраивается при смене поколения recipe_ingredients.
+    """
+
+    def __init__(self):
+        self.index = (None, array("q"), array("H"), {})
+        self.lock = Lock()
+
+    def build(self, generation):
+        recipe_ids = array("q")
+        sizes = array("H")
+        postings = {}
+        positions = {}
+        with read_from_primary():
+            rows = (
+                IngredientRecipe.objects.order_by("recipe_id")
+                .values_list("recipe_id", "ingredient_id")
+                .iterator(chunk_size=10000)
+            )
+            for recipe_id, ingredient_id in rows:
+                position = positions.get(recipe_id)
+                if position is None:
+                    position = positions[recipe_id] = len(recipe_ids)
+                    recipe_ids.append(recipe_id)
+                    sizes.append(0)
+                sizes[position] += 1
+                postings.setdefault(ingredient_id, array("I")).append(
+                    position
+                )
+        self.index = (generation, recipe_ids, sizes, postings)
+
+    def get_index(self):
+        generation = get_generation("recipe_ingredients")
+        if self.index[0] != generation:
+            with self.lock:
+                if self.index[0] != generation:
+                    self.build(generation)
+        return self.index
+
+    def match(self, ingredient_ids):
+        """Подбирает рецепты, в которых есть хотя бы один из ингредиентов.
+
+        Возвращает список кортежей (id рецепта, найдено, всего),
+        отсортированный по доле найденных ингредиентов, затем по числу
+        недостающих и по убыванию id.
+        """
+        _, recipe_ids, sizes, postings = self.get_index()
+        counts = Counter()
+        for ingredient_id in set(ingredient_ids):
+            counts.update(postings.get(ingredient_id, ()))
+        matches = [
+            (recipe_ids[position], found, sizes[position])
+            for position, found in counts.items()
+        ]
+        matches.sort(
+            key=lambda match: (
+                -match[1] / match[2],
+                match[2] - match[1],
+                -match[0],
+            )
+        )
+        return matches
+
+
+recipe_ingredient_index = RecipeIngredientIndex()
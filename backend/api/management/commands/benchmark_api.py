@@ -0,0 +1,255 @@
+from time import perf_counter
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Prefetch
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from api.serializers import (
+    CustomUserSerializer,
+    FollowSerializer,
+    RecipeSerializer,
+)
+from recipes.models import Ingredient, IngredientRecipe, Recipe, Tag
+from users.models import Follow
+
+User = get_user_model()
+
+PAGE_SIZE = 6
+
+# Бюджеты: (максимум SQL-запросов, p95 в миллисекундах).
+SERIALIZER_BUDGETS = {
+    "RecipeSerializer": (1, 20),
+    "FollowSerializer": (0, 10),
+    "CustomUserSerializer": (1, 10),
+}
+ENDPOINT_BUDGETS = {
+    "recipes": (6, 100),
+    "recipes_anonymous": (6, 100),
+    "recipes_tags": (7, 120),
+    "recipes_popular": (6, 100),
+    "recipes_cursor": (5, 100),
+    "recipes_search": (7, 150),
+    "recipes_favorited": (6, 120),
+    "recipe_detail": (5, 60),
+    "feed": (6, 100),
+    "cookable": (5, 150),
+    "subscriptions": (3, 60),
+    "users": (3, 40),
+    "users_me": (1, 20),
+    "tags": (1, 20),
+    "ingredients": (1, 20),
+    "download_shopping_cart": (1, 60),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Замеряет число SQL-запросов и время сериализаторов и эндпоинтов "
+        "API и сверяет их с бюджетами. Данные для замеров создаёт "
+        "команда seed_data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--repeat", type=int, default=20, help="Число повторов замера."
+        )
+        parser.add_argument(
+            "--warmup", type=int, default=3, help="Число прогревов."
+        )
+        parser.add_argument(
+            "--latency-scale",
+            type=float,
+            default=1.0,
+            help="Множитель бюджетов времени для медленных машин.",
+        )
+        parser.add_argument(
+            "--user",
+            help="Почта пользователя, от имени которого идут запросы.",
+        )
+
+    def measure(self, name, budget, call):
+        """Замеряет вызов и возвращает описание нарушения бюджета."""
+        for _ in range(self.warmup):
+            call()
+        timings = []
+        for _ in range(self.repeat):
+            with CaptureQueriesContext(connection) as context:
+                start = perf_counter()
+                call()
+                timings.append((perf_counter() - start) * 1000)
+        timings.sort()
+        median = timings[len(timings) // 2]
+        p95 = timings[min(int(len(timings) * 0.95), len(timings) - 1)]
+        queries = len(context)
+        max_queries, max_ms = budget
+        max_ms *= self.latency_scale
+        failures = []
+        if queries > max_queries:
+            failures.append(f"запросов {queries} > {max_queries}")
+        if p95 > max_ms:
+            failures.append(f"p95 {p95:.1f}мс > {max_ms:.0f}мс")
+        self.stdout.write(
+            f"{name:24} queries={queries:3d} median={median:7.2f}ms "
+            f"p95={p95:7.2f}ms "
+            + (
+                self.style.ERROR("; ".join(failures))
+                if failures
+                else self.style.SUCCESS("OK")
+            )
+        )
+        return f"{name}: {'; '.join(failures)}" if failures else None
+
+    def get_user(self, email):
+        if email:
+            try:
+                return User.objects.get(email=email)
+            except User.DoesNotExist:
+                raise CommandError(f"Пользователь {email} не найден.")
+        follow = Follow.objects.order_by("user_id").first()
+        if follow is None:
+            raise CommandError("В базе нет подписок, запустите seed_data.")
+        return follow.user
+
+    def serializer_cases(self, user):
+        """Сериализация заранее загруженных страниц, без выборки."""
+        recipes = list(
+            Recipe.objects.with_user_flags(user)
+            .select_related("author")
+            .prefetch_related("ingredients_recipes__ingredient", "tags")[
+                :PAGE_SIZE
+            ]
+        )
+        follows = list(
+            Follow.objects.filter(user=user)
+            .select_related("author")
+            .prefetch_related(
+                Prefetch(
+                    "author__recipes",
+                    queryset=Recipe.objects.limit_per_author(3),
+                )
+            )[:PAGE_SIZE]
+        )
+        users = list(User.objects.all()[:PAGE_SIZE])
+
+        def serialize(serializer_class, page):
+            def call():
+                request = Request(APIRequestFactory().get("/"))
+                request.user = user
+                serializer_class(
+                    page, many=True, context={"request": request}
+                ).data
+
+            return call
+
+        return {
+            "RecipeSerializer": serialize(RecipeSerializer, recipes),
+            "FollowSerializer": serialize(FollowSerializer, follows),
+            "CustomUserSerializer": serialize(CustomUserSerializer, users),
+        }
+
+    def endpoint_cases(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        anonymous = APIClient()
+        recipe = Recipe.objects.order_by("-favorites_count").first()
+        tags = list(Tag.objects.values_list("slug", flat=True)[:2])
+        ingredient = Ingredient.objects.first()
+        ingredients = list(
+            IngredientRecipe.objects.filter(recipe=recipe).values_list(
+                "ingredient_id", flat=True
+            )
+        )
+        urls = {
+            "recipes": (client, "/api/recipes/"),
+            "recipes_anonymous": (anonymous, "/api/recipes/"),
+            "recipes_tags": (client, "/api/recipes/", {"tags": tags}),
+            "recipes_popular": (
+                client,
+                "/api/recipes/",
+                {"ordering": "popular"},
+            ),
+            "recipes_cursor": (
+                client,
+                "/api/recipes/",
+                {"paginate": "cursor"},
+            ),
+            "recipes_search": (
+                client,
+                "/api/recipes/",
+                {"search": recipe.name},
+            ),
+            "recipes_favorited": (
+                client,
+                "/api/recipes/",
+                {"is_favorited": 1},
+            ),
+            "recipe_detail": (client, f"/api/recipes/{recipe.id}/"),
+            "feed": (client, "/api/recipes/feed/"),
+            "cookable": (
+                client,
+                "/api/recipes/cookable/",
+                {"ingredients": ingredients},
+            ),
+            "subscriptions": (
+                client,
+                "/api/users/subscriptions/",
+                {"recipes_limit": 3},
+            ),
+            "users": (client, "/api/users/"),
+            "users_me": (client, "/api/users/me/"),
+            "tags": (client, "/api/tags/"),
+            "ingredients": (
+                client,
+                "/api/ingredients/",
+                {"name": ingredient.name[:2]},
+            ),
+            "download_shopping_cart": (
+                client,
+                "/api/recipes/download_shopping_cart/",
+            ),
+        }
+        return {
+            name: self.make_request(*arguments)
+            for name, arguments in urls.items()
+        }
+
+    @staticmethod
+    def make_request(client, url, data=None):
+        def call():
+            response = client.get(url, data)
+            if response.status_code != 200:
+                raise CommandError(f"{url}: ответ {response.status_code}")
+            if response.streaming:
+                b"".join(response.streaming_content)
+
+        return call
+
+    def handle(self, *args, **options):
+        self.repeat = options["repeat"]
+        self.warmup = options["warmup"]
+        self.latency_scale = options["latency_scale"]
+        if not Recipe.objects.exists():
+            raise CommandError("В базе нет рецептов, запустите seed_data.")
+        user = self.get_user(options["user"])
+        failures = []
+        with override_settings(ALLOWED_HOSTS=["testserver"]):
+            self.stdout.write("Сериализаторы:")
+            for name, call in self.serializer_cases(user).items():
+                failures.append(
+                    self.measure(name, SERIALIZER_BUDGETS[name], call)
+                )
+            self.stdout.write("Эндпоинты:")
+            for name, call in self.endpoint_cases(user).items():
+                failures.append(
+                    self.measure(name, ENDPOINT_BUDGETS[name], call)
+                )
+        failures = [failure for failure in failures if failure]
+        if failures:
+            raise CommandError(
+                "Превышены бюджеты:\n" + "\n".join(failures)
+            )
+        self.stdout.write(self.style.SUCCESS("Все бюджеты соблюдены."))
@@ -0,0 +1,49 @@
+from time import perf_counter
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.views import RecipeViewSet
+from recipes.models import Tag
+
+PAGE_SIZE = 6
+
+
+class Command(BaseCommand):
+    help = (
+        "Замеряет время выборки первой страницы ленты и подсчёта рецептов "
+        "при фильтрации по 1–10 тегам."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--repeat", type=int, default=20, help="Число повторов замера."
+        )
+
+    def handle(self, *args, **options):
+        slugs = list(Tag.objects.values_list("slug", flat=True)[:10])
+        if not slugs:
+            raise CommandError("В базе нет тегов.")
+        for number in range(1, len(slugs) + 1):
+            request = Request(
+                APIRequestFactory().get("/", {"tags": slugs[:number]})
+            )
+            request.user = AnonymousUser()
+            view = RecipeViewSet(
+                request=request, format_kwarg=None, action="list"
+            )
+            timings = []
+            for _ in range(options["repeat"]):
+                start = perf_counter()
+                queryset = view.filter_queryset(view.get_queryset())
+                count = queryset.count()
+                list(queryset[:PAGE_SIZE])
+                timings.append(perf_counter() - start)
+            timings.sort()
+            self.stdout.write(
+                f"tags={number:2d} count={count} "
+                f"median={timings[len(timings) // 2] * 1000:.2f}ms "
+                f"max={timings[-1] * 1000:.2f}ms"
+            )
@@ -0,0 +1,178 @@
+from itertools import combinations
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.filters import ORDERINGS
+from api.views import FollowViewSet, RecipeViewSet
+from recipes.models import Recipe, Tag
+from users.models import User
+
+PAGE_SIZE = 6
+
+# Индексы под шаблоны доступа ленты в виде (таблица, первые столбцы):
+# каждый должен выбираться планировщиком хотя бы в одном из проверяемых
+# запросов. Индексы описаны столбцами, потому что имена индексов внешних
+# ключей Django генерирует сам.
+EXPECTED_INDEXES = (
+    ("recipes_recipe", ("author_id", "id")),
+    ("recipes_recipe", ("favorites_count", "id")),
+    ("recipes_recipe", ("trending_score", "id")),
+    ("recipes_recipe", ("cooking_time", "id")),
+    ("recipes_tagrecipe", ("recipe_id",)),
+    ("recipes_favorite", ("user_id", "recipe_id")),
+    ("recipes_shoppingcart", ("user_id", "recipe_id")),
+    ("users_follow", ("user_id", "author_id")),
+)
+
+# Таблицы, растущие с числом рецептов; полный просмотр любой из них
+# означает, что запрос деградирует линейно.
+LARGE_TABLES = (
+    "recipes_recipe",
+    "recipes_tagrecipe",
+    "recipes_ingredientrecipe",
+    "recipes_favorite",
+    "recipes_shoppingcart",
+    "users_follow",
+)
+
+
+def get_plan(queryset):
+    """Возвращает план запроса в виде разобранного JSON."""
+    sql, params = queryset.query.get_compiler(queryset.db).as_sql()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        return cursor.fetchone()[0][0]["Plan"]
+
+
+def get_index_columns(tables):
+    """Сопоставляет имена индексов таблиц их таблице и столбцам."""
+    columns = {}
+    with connection.cursor() as cursor:
+        for table in tables:
+            constraints = connection.introspection.get_constraints(
+                cursor, table
+            )
+            for name, constraint in constraints.items():
+                if constraint["index"] or constraint["unique"]:
+                    columns[name] = (table, tuple(constraint["columns"]))
+    return columns
+
+
+def get_scans(plan):
+    """Собирает узлы плана вида (тип узла, таблица, индекс)."""
+    scans = [
+        (
+            plan["Node Type"],
+            plan.get("Relation Name"),
+            plan.get("Index Name"),
+        )
+    ]
+    for child in plan.get("Plans", ()):
+        scans.extend(get_scans(child))
+    return scans
+
+
+class Command(BaseCommand):
+    help = (
+        "Проверяет планы запросов ленты рецептов и подписок на заполненной "
+        "базе: после ANALYZE большие таблицы не должны читаться целиком, "
+        "а добавленные под ленту индексы должны использоваться."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user", type=int, help="id пользователя для фильтров."
+        )
+        parser.add_argument(
+            "--min-recipes",
+            type=int,
+            default=1000,
+            help="Минимальное число рецептов, при котором планы показательны.",
+        )
+
+    def get_request(self, user, params):
+        request = Request(APIRequestFactory().get("/", params))
+        request.user = user
+        return request
+
+    def get_recipes(self, user, params):
+        request = self.get_request(user, params)
+        view = RecipeViewSet(request=request, format_kwarg=None, action="list")
+        return view.filter_queryset(view.get_queryset())[:PAGE_SIZE]
+
+    def get_querysets(self, user):
+        tags = list(Tag.objects.values_list("slug", flat=True)[:3])
+        filters = {
+            "tags": tags,
+            "author": user.id,
+            "is_favorited": 1,
+            "is_in_shopping_cart": 1,
+        }
+        for size in range(len(filters) + 1):
+            for names in combinations(filters, size):
+                params = {name: filters[name] for name in names}
+                yield f"recipes {params}", self.get_recipes(user, params)
+        for ordering in ORDERINGS:
+            params = {"ordering": ordering}
+            yield f"recipes {params}", self.get_recipes(user, params)
+        view = FollowViewSet(
+            request=self.get_request(user, {}),
+            format_kwarg=None,
+            action="list",
+        )
+        yield "subscriptions", view.get_queryset()[:PAGE_SIZE]
+        yield "subscribe", view.get_queryset().filter(author=user)
+        yield "subscription recipes", Recipe.objects.filter(
+            author=user
+        ).limit_per_author(PAGE_SIZE)
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("Проверка планов доступна только PostgreSQL.")
+        if Recipe.objects.count() < options["min_recipes"]:
+            raise CommandError(
+                "Слишком мало рецептов для показательных планов, "
+                "заполните базу командой seed_data."
+            )
+        users = User.objects.all()
+        if options["user"]:
+            users = users.filter(id=options["user"])
+        user = users.first()
+        if user is None:
+            raise CommandError("В базе нет пользователей.")
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        failures = []
+        used = set()
+        for label, queryset in self.get_querysets(user):
+            scans = get_scans(get_plan(queryset))
+            used.update(index for _, _, index in scans if index)
+            full = sorted(
+                {
+                    table
+                    for node, table, _ in scans
+                    if node == "Seq Scan" and table in LARGE_TABLES
+                }
+            )
+            if full:
+                failures.append(f"{label}: Seq Scan по {', '.join(full)}")
+                self.stdout.write(self.style.ERROR(f"FAIL {label}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"OK {label}"))
+        columns = get_index_columns({table for table, _ in EXPECTED_INDEXES})
+        used = {columns[index] for index in used if index in columns}
+        unused = [
+            f"{table}({', '.join(prefix)})"
+            for table, prefix in EXPECTED_INDEXES
+            if not any(
+                used_table == table and used_columns[: len(prefix)] == prefix
+                for used_table, used_columns in used
+            )
+        ]
+        if unused:
+            failures.append(f"Не используются индексы: {', '.join(unused)}")
+        if failures:
+            raise CommandError("\n".join(failures))
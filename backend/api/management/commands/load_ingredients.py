@@ -0,0 +1,145 @@
+import csv
+import io
+import json
+from itertools import islice
+from pathlib import Path
+from time import perf_counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from api.cache import bump_generation
+from recipes.models import Ingredient
+
+DEFAULT_PATH = settings.BASE_DIR.parent / "data" / "ingredients.csv"
+READ_SIZE = 64 * 1024
+
+
+def read_csv(file):
+    for row in csv.reader(file):
+        if row:
+            yield row[0], row[1]
+
+
+def read_json(file):
+    """Построчно разбирает JSON-массив, не загружая файл целиком."""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    started = False
+    while True:
+        chunk = file.read(READ_SIZE)
+        buffer += chunk
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                position += 1
+            if not started and buffer[position:position + 1] == "[":
+                started = True
+                position += 1
+                continue
+            if buffer[position:position + 1] == "]":
+                return
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if not chunk:
+                    raise CommandError("Некорректный JSON.")
+                break
+            yield item["name"], item["measurement_unit"]
+        buffer = buffer[position:]
+        if not chunk:
+            return
+
+
+class Command(BaseCommand):
+    help = "Загружает ингредиенты из CSV или JSON файла."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path", nargs="?", default=DEFAULT_PATH, type=Path
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Размер пачки строк для вставки.",
+        )
+        parser.add_argument(
+            "--copy",
+            action="store_true",
+            help="Загрузить через COPY (только PostgreSQL).",
+        )
+
+    def report(self, rows, start):
+        elapsed = perf_counter() - start
+        self.stdout.write(
+            f"{rows} строк, {rows / elapsed if elapsed else 0:.0f} строк/с"
+        )
+
+    def batches(self, rows, size):
+        while True:
+            batch = list(islice(rows, size))
+            if not batch:
+                return
+            yield batch
+
+    def load_bulk(self, rows, batch_size, start):
+        total = 0
+        for batch in self.batches(rows, batch_size):
+            Ingredient.objects.bulk_create(
+                (
+                    Ingredient(name=name, measurement_unit=measurement_unit)
+                    for name, measurement_unit in batch
+                ),
+                ignore_conflicts=True,
+            )
+            total += len(batch)
+            self.report(total, start)
+
+    def load_copy(self, rows, batch_size, start):
+        table = Ingredient._meta.db_table
+        total = 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "CREATE TEMP TABLE ingredients_load "
+                "(name varchar(200), measurement_unit varchar(200)) "
+                "ON COMMIT DROP"
+            )
+            for batch in self.batches(rows, batch_size):
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(batch)
+                buffer.seek(0)
+                cursor.cursor.copy_expert(
+                    "COPY ingredients_load (name, measurement_unit) "
+                    "FROM STDIN WITH (FORMAT csv)",
+                    buffer,
+                )
+                total += len(batch)
+                self.report(total, start)
+            cursor.execute(
+                f"INSERT INTO {table} (name, measurement_unit) "
+                "SELECT DISTINCT name, measurement_unit FROM ingredients_load "
+                "ON CONFLICT (name, measurement_unit) DO NOTHING"
+            )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        if not path.exists():
+            raise CommandError(f"Файл {path} не найден.")
+        if options["copy"] and connection.vendor != "postgresql":
+            raise CommandError("COPY доступен только для PostgreSQL.")
+        read = read_json if path.suffix == ".json" else read_csv
+        load = self.load_copy if options["copy"] else self.load_bulk
+        before = Ingredient.objects.count()
+        start = perf_counter()
+        with open(path, encoding="utf-8") as file, transaction.atomic():
+            load(read(file), options["batch_size"], start)
+        bump_generation("ingredients")
+        added = Ingredient.objects.count() - before
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Добавлено ингредиентов: {added} "
+                f"за {perf_counter() - start:.2f} с."
+            )
+        )
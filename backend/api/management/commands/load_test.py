@@ -0,0 +1,127 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle
+from time import perf_counter, sleep
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+DEFAULT_PATHS = (
+    "/api/recipes/",
+    "/api/recipes/?limit=20",
+    "/api/tags/",
+    "/api/ingredients/?name=со",
+    "/api/users/subscriptions/",
+)
+
+
+def process_tree_rss(pid):
+    """Суммарная резидентная память процесса и его потомков в байтах."""
+    total = 0
+    pids = [pid]
+    while pids:
+        current = pids.pop()
+        try:
+            with open(f"/proc/{current}/status") as status:
+                for line in status:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children") as file:
+                    pids.extend(int(child) for child in file.read().split())
+        except FileNotFoundError:
+            continue
+    return total
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагружает запущенный сервер запросами к горячим эндпоинтам и "
+        "выводит пропускную способность, задержки и память сервера. "
+        "Позволяет сравнить настройки воркеров и API_PARALLEL_QUERIES."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "url", help="Адрес сервера, например http://localhost:8000"
+        )
+        parser.add_argument("--paths", nargs="+", default=DEFAULT_PATHS)
+        parser.add_argument("--concurrency", type=int, default=32)
+        parser.add_argument(
+            "--duration", type=float, default=30, help="Секунды нагрузки."
+        )
+        parser.add_argument("--token", help="Токен для авторизации.")
+        parser.add_argument(
+            "--server-pid",
+            type=int,
+            help="PID мастер-процесса сервера для замера памяти.",
+        )
+
+    def worker(self, paths, deadline):
+        session = requests.Session()
+        if self.token:
+            session.headers["Authorization"] = f"Token {self.token}"
+        timings = []
+        errors = 0
+        for path in cycle(paths):
+            start = perf_counter()
+            if start > deadline:
+                break
+            try:
+                response = session.get(self.url + path, timeout=30)
+                if response.status_code >= 400:
+                    errors += 1
+            except requests.RequestException:
+                errors += 1
+            timings.append(perf_counter() - start)
+        return timings, errors
+
+    def sample_memory(self, deadline):
+        peak = 0
+        while perf_counter() < deadline:
+            peak = max(peak, process_tree_rss(self.server_pid))
+            sleep(0.5)
+        return peak
+
+    def handle(self, *args, **options):
+        self.url = options["url"].rstrip("/")
+        self.token = options["token"]
+        self.server_pid = options["server_pid"]
+        try:
+            requests.get(self.url + options["paths"][0], timeout=10)
+        except requests.RequestException as error:
+            raise CommandError(f"Сервер недоступен: {error}")
+        start = perf_counter()
+        deadline = start + options["duration"]
+        with ThreadPoolExecutor(options["concurrency"] + 1) as executor:
+            if self.server_pid:
+                memory = executor.submit(self.sample_memory, deadline)
+            results = list(
+                executor.map(
+                    lambda _: self.worker(options["paths"], deadline),
+                    range(options["concurrency"]),
+                )
+            )
+        elapsed = perf_counter() - start
+        timings = sorted(
+            timing for worker, _ in results for timing in worker
+        )
+        errors = sum(worker_errors for _, worker_errors in results)
+        if not timings:
+            raise CommandError("Не выполнено ни одного запроса.")
+
+        def percentile(value):
+            index = min(int(len(timings) * value), len(timings) - 1)
+            return timings[index] * 1000
+
+        self.stdout.write(
+            f"Запросов: {len(timings)}, ошибок: {errors}, "
+            f"{len(timings) / elapsed:.1f} запросов/с\n"
+            f"p50={percentile(0.5):.1f}ms p95={percentile(0.95):.1f}ms "
+            f"p99={percentile(0.99):.1f}ms"
+        )
+        if self.server_pid:
+            self.stdout.write(
+                "Пиковая память сервера: "
+                f"{memory.result() / 2 ** 20:.0f} МБ"
+            )
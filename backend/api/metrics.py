@@ -0,0 +1,138 @@
+from bisect import bisect_left
+from collections import defaultdict
+from threading import Lock
+
+from django.http import HttpResponse
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+
+HELP = {
+    "api_requests_total": ("counter", "Число запросов к API."),
+    "api_request_duration_seconds": (
+        "histogram",
+        "Время обработки запроса.",
+    ),
+    "api_db_queries": ("histogram", "Число SQL-запросов на запрос к API."),
+    "api_db_duration_seconds_total": ("counter", "Суммарное время SQL."),
+    "api_render_duration_seconds_total": (
+        "counter",
+        "Суммарное время отрисовки ответов.",
+    ),
+    "api_response_bytes_total": ("counter", "Суммарный размер ответов."),
+    "api_db_connections_created_total": (
+        "counter",
+        "Число открытых соединений с базой.",
+    ),
+    "api_db_connections_reused_total": (
+        "counter",
+        "Число повторных использований постоянных соединений.",
+    ),
+    "api_db_health_check_failures_total": (
+        "counter",
+        "Число соединений, закрытых после неудачной проверки.",
+    ),
+    "api_auth_cache_total": (
+        "counter",
+        "Число проверок токена по кэшу: попадания и промахи.",
+    ),
+    "api_duplicate_queries_total": (
+        "counter",
+        "Число найденных повторяющихся SQL-запросов (N+1).",
+    ),
+}
+
+
+class Registry:
+    """Метрики запросов в памяти процесса.
+
+    У каждого воркера свои значения; Prometheus собирает их с каждого
+    процесса отдельно и суммирует при запросах.
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        self.counters = defaultdict(float)
+        self.histograms = {}
+
+    def increase(self, name, labels, value=1):
+        with self.lock:
+            self.counters[name, labels] += value
+
+    def observe(self, name, labels, value, buckets):
+        with self.lock:
+            key = (name, labels)
+            if key not in self.histograms:
+                self.histograms[key] = (buckets, [0] * len(buckets), [0, 0])
+            _, counts, total = self.histograms[key]
+            index = bisect_left(buckets, value)
+            if index < len(buckets):
+                counts[index] += 1
+            total[0] += 1
+            total[1] += value
+
+    def render(self):
+        """Отдаёт метрики в текстовом формате Prometheus."""
+        samples = defaultdict(list)
+        with self.lock:
+            for (name, labels), value in self.counters.items():
+                samples[name].append((name, labels, value))
+            for (name, labels), histogram in self.histograms.items():
+                buckets, counts, (count, total) = histogram
+                cumulative = 0
+                for bucket, bucket_count in zip(buckets, counts):
+                    cumulative += bucket_count
+                    samples[name].append(
+                        (
+                            f"{name}_bucket",
+                            labels + (("le", f"{bucket:g}"),),
+                            cumulative,
+                        )
+                    )
+                samples[name].append(
+                    (f"{name}_bucket", labels + (("le", "+Inf"),), count)
+                )
+                samples[name].append((f"{name}_count", labels, count))
+                samples[name].append((f"{name}_sum", labels, total))
+        lines = []
+        for name in sorted(samples):
+            kind, description = HELP[name]
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+            for sample, labels, value in samples[name]:
+                lines.append(
+                    f"{sample}{format_labels(labels)} {format_value(value)}"
+                )
+        return "\n".join(lines) + "\n"
+
+
+def format_value(value):
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(
+            name,
+            str(value)
+            .replace("\\", "\\\\")
+            .replace('"', '\\"')
+            .replace("\n", "\\n"),
+        )
+        for name, value in labels
+    )
+    return f"{{{pairs}}}"
+
+
+registry = Registry()
+
+
+def metrics_view(request):
+    """Отдаёт метрики для Prometheus."""
+    return HttpResponse(
+        registry.render(), content_type="text/plain; version=0.0.4"
+    )
@@ -0,0 +1,169 @@
+import logging
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from threading import Lock
+from time import perf_counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework.permissions import SAFE_METHODS
+
+from .metrics import DURATION_BUCKETS, QUERY_BUCKETS, registry
+from .routers import get_replicas, pin_to_primary
+
+logger = logging.getLogger(__name__)
+
+# Счётчик запросов текущего запроса к API; контекст копируется в потоки
+# пула параллельных запросов, и они пишут в тот же счётчик.
+query_recorder = ContextVar("query_recorder", default=None)
+
+
+class QueryRecorder:
+    """Считает SQL-запросы, их время и повторы одного шаблона."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.templates = Counter()
+        self.lock = Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = perf_counter() - start
+            with self.lock:
+                self.duration += duration
+                self.count += 1
+                self.templates[sql] += 1
+
+
+@contextmanager
+def record_queries():
+    """Передаёт запросы соединений текущего потока в счётчик запроса."""
+    recorder = query_recorder.get()
+    with ExitStack() as stack:
+        if recorder is not None:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+        yield
+
+
+def get_view_name(request, view_func):
+    """Возвращает имя вью и действия, например RecipeViewSet.list."""
+    cls = getattr(view_func, "cls", None)
+    if cls is None:
+        return f"{view_func.__module__}.{view_func.__name__}"
+    method = request.method.lower()
+    actions = getattr(view_func, "actions", None) or {}
+    return f"{cls.__name__}.{actions.get(method, method)}"
+
+
+class InstrumentationMiddleware:
+    """Собирает метрики запросов: число и время SQL, время отрисовки ответа
+    и его размер.
+
+    Включается настройкой API_INSTRUMENTATION. Времена отдаются клиенту
+    в заголовке Server-Timing, накопленные значения — на /metrics.
+    Шаблоны SQL, выполненные за запрос API_DUPLICATE_QUERY_THRESHOLD
+    и более раз, пишутся в лог как вероятные N+1.
+    """
+
+    def __init__(self, get_response):
+        if not settings.API_INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        token = query_recorder.set(recorder)
+        start = perf_counter()
+        try:
+            with record_queries():
+                response = self.get_response(request)
+        finally:
+            query_recorder.reset(token)
+        view = getattr(request, "_instrumented_view", None)
+        if view is not None:
+            self.record(
+                request, response, view, recorder, perf_counter() - start
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._instrumented_view = get_view_name(request, view_func)
+
+    def process_template_response(self, request, response):
+        start = perf_counter()
+
+        def finish(response):
+            request._render_duration = perf_counter() - start
+
+        response.add_post_render_callback(finish)
+        return response
+
+    def record(self, request, response, view, recorder, total):
+        render = getattr(request, "_render_duration", 0.0)
+        app = max(total - recorder.duration - render, 0.0)
+        labels = (("view", view),)
+        registry.increase(
+            "api_requests_total",
+            labels
+            + (("method", request.method), ("status", response.status_code)),
+        )
+        registry.observe(
+            "api_request_duration_seconds", labels, total, DURATION_BUCKETS
+        )
+        registry.observe(
+            "api_db_queries", labels, recorder.count, QUERY_BUCKETS
+        )
+        registry.increase(
+            "api_db_duration_seconds_total", labels, recorder.duration
+        )
+        registry.increase("api_render_duration_seconds_total", labels, render)
+        if not response.streaming:
+            registry.increase(
+                "api_response_bytes_total", labels, len(response.content)
+            )
+        for sql, count in recorder.templates.items():
+            if count >= settings.API_DUPLICATE_QUERY_THRESHOLD:
+                registry.increase("api_duplicate_queries_total", labels)
+                logger.warning(
+                    "%s: запрос выполнен %d раз: %s", view, count, sql
+                )
+        response["Server-Timing"] = ", ".join(
+            (
+                f'db;dur={recorder.duration * 1000:.1f};'
+                f'desc="{recorder.count} queries"',
+                f"app;dur={app * 1000:.1f}",
+                f"render;dur={render * 1000:.1f}",
+                f"total;dur={total * 1000:.1f}",
+            )
+        )
+
+
+class ReplicaPinMiddleware:
+    """Закрепляет пользователя за основной базой после изменений.
+
+    После успешного небезопасного запроса чтение данных пользователя
+    DB_REPLICA_PIN_SECONDS секунд идёт с основной базы, чтобы, например,
+    только что добавленный в избранное рецепт не показался невыбранным.
+    """
+
+    def __init__(self, get_response):
+        if not get_replicas():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (
+            request.method not in SAFE_METHODS
+            and response.status_code < 400
+            and request.user.is_authenticated
+        ):
+            pin_to_primary(request.user)
+        return response
@@ -1,9 +1,147 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.paginator import InvalidPage
+from django.db import connections
+from django.db.models import QuerySet
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+
+from .concurrency import run_parallel
+
+
+def estimate_count(queryset):
+    """Оценивает число строк по плану запроса без COUNT(*)."""
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return queryset.count()
+    # QuerySet.explain() превращает разобранный psycopg2 JSON в repr
+    # Python, поэтому план читается напрямую из курсора.
+    sql, params = queryset.query.get_compiler(queryset.db).as_sql()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Plan"]["Plan Rows"]
+
+
+def get_parallel_queries(view):
+    """Запросы вью, которые выполняются одновременно со страницей."""
+    get_queries = getattr(view, "get_parallel_queries", None)
+    return get_queries() if get_queries is not None else ()
 
 
 class CustomPagination(PageNumberPagination):
-    """Кастомный пагинатор."""
+    """Кастомный пагинатор.
+
+    При включённой API_PARALLEL_QUERIES страница и общее количество
+    выборки из базы запрашиваются одновременно; списки пагинируются
+    как обычно.
+    """
 
     page_size = 6
     page_size_query_param = "limit"
     max_page_size = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_size = self.get_page_size(request)
+        number = request.query_params.get(self.page_query_param, "1")
+        if (
+            not settings.API_PARALLEL_QUERIES
+            or not isinstance(queryset, QuerySet)
+            or not page_size
+            or not number.isdigit()
+            or int(number) < 1
+        ):
+            return super().paginate_queryset(queryset, request, view)
+        number = int(number)
+        bottom = (number - 1) * page_size
+        rows, count, *_ = run_parallel(
+            lambda: list(queryset[bottom:bottom + page_size]),
+            queryset.count,
+            *get_parallel_queries(view),
+        )
+        paginator = self.django_paginator_class(queryset, page_size)
+        paginator.count = count
+        try:
+            paginator.validate_number(number)
+        except InvalidPage as exc:
+            raise NotFound(
+                self.invalid_page_message.format(
+                    page_number=number, message=str(exc)
+                )
+            )
+        self.page = paginator._get_page(rows, number, paginator)
+        self.request = request
+        return rows
+
+
+class CustomCursorPagination(CursorPagination):
+    """Курсорный пагинатор по убыванию id.
+
+    Если у выборки задана явная сортировка, курсор строится по ней.
+    Общее количество по умолчанию не считается; параметр count=exact
+    считает его точно, count=estimate оценивает по плану запроса.
+    """
+
+    ordering = "-id"
+    page_size = 6
+    page_size_query_param = "limit"
+    max_page_size = 100
+    count_query_param = "count"
+
+    def get_ordering(self, request, queryset, view):
+        return tuple(queryset.query.order_by) or super().get_ordering(
+            request, queryset, view
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        count = request.query_params.get(self.count_query_param)
+        paginate = super().paginate_queryset
+        queries = get_parallel_queries(view)
+        if count == "exact":
+            self.count, page, *_ = run_parallel(
+                queryset.count,
+                lambda: paginate(queryset, request, view),
+                *queries,
+            )
+        elif count == "estimate":
+            self.count, page, *_ = run_parallel(
+                lambda: estimate_count(queryset),
+                lambda: paginate(queryset, request, view),
+                *queries,
+            )
+        else:
+            self.count = None
+            page, *_ = run_parallel(
+                lambda: paginate(queryset, request, view), *queries
+            )
+        return page
+
+    def get_paginated_response(self, data):
+        return Response(
+            OrderedDict(
+                [
+                    ("count", self.count),
+                    ("next", self.get_next_link()),
+                    ("previous", self.get_previous_link()),
+                    ("results", data),
+                ]
+            )
+        )
+
+
+class CursorPaginationMixin:
+    """Включает курсорную пагинацию по параметру paginate=cursor."""
+
+    @property
+    def paginator(self):
+        if not hasattr(self, "_paginator"):
+            if self.request.query_params.get("paginate") == "cursor":
+                self._paginator = CustomCursorPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
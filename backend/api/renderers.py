@@ -0,0 +1,84 @@
+import csv
+
+from rest_framework.exceptions import NotAcceptable
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.renderers import BaseRenderer
+
+
+class FileContentNegotiation(DefaultContentNegotiation):
+    """Согласование формата файла.
+
+    Параметр format важнее заголовка Accept. Если Accept не подходит ни
+    одному рендереру, отдаётся первый, чтобы клиент с
+    Accept: application/json получил файл, а не 406.
+    """
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        format = format_suffix or request.query_params.get(
+            self.settings.URL_FORMAT_OVERRIDE
+        )
+        if format:
+            renderers = self.filter_renderers(renderers, format)
+            return renderers[0], renderers[0].media_type
+        try:
+            return super().select_renderer(request, renderers, format_suffix)
+        except NotAcceptable:
+            return renderers[0], renderers[0].media_type
+
+
+class ShoppingCartRenderer(BaseRenderer):
+    """Базовый рендерер для списка покупок."""
+
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            return "\n".join(str(value) for value in data.values())
+        return "".join(self.stream(data))
+
+    def stream(self, ingredients):
+        """Построчно отдаёт содержимое файла."""
+        raise NotImplementedError
+
+
+class ShoppingCartTXTRenderer(ShoppingCartRenderer):
+    """Рендерер списка покупок в текстовый файл."""
+
+    media_type = "text/plain"
+    format = "txt"
+
+    def stream(self, ingredients):
+        for ingredient in ingredients:
+            yield (
+                f"{ingredient['ingredient__name']} "
+                f"({ingredient['ingredient__measurement_unit']}) — "
+                f"{ingredient['total_amount']}\n"
+            )
+
+
+class Echo:
+    """Псевдобуфер, возвращающий записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+class ShoppingCartCSVRenderer(ShoppingCartRenderer):
+    """Рендерер списка покупок в CSV."""
+
+    media_type = "text/csv"
+    format = "csv"
+
+    def stream(self, ingredients):
+        writer = csv.writer(Echo())
+        yield writer.writerow(
+            ("Ингредиент", "Единицы измерения", "Количество")
+        )
+        for ingredient in ingredients:
+            yield writer.writerow(
+                (
+                    ingredient["ingredient__name"],
+                    ingredient["ingredient__measurement_unit"],
+                    ingredient["total_amount"],
+                )
+            )
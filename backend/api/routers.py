@@ -0,0 +1,87 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.permissions import SAFE_METHODS
+
+# Реплика, с которой читает текущий запрос; None — основная база.
+read_replica = ContextVar("read_replica", default=None)
+
+
+def get_replicas():
+    return [
+        alias for alias in settings.DATABASES if alias.startswith("replica")
+    ]
+
+
+@contextmanager
+def read_from_primary():
+    """Читает с основной базы внутри блока.
+
+    Нужен для всего, что переживает запрос: индексов и записей кэша,
+    которые перестраиваются после изменений. Прочитанные с отстающей
+    реплики, они остались бы устаревшими до следующего изменения.
+    """
+    token = read_replica.set(None)
+    try:
+        yield
+    finally:
+        read_replica.reset(token)
+
+
+def pin_key(user):
+    return f"db:pinned:{user.id}"
+
+
+def pin_to_primary(user):
+    """Читает данные пользователя с основной базы, пока реплики догоняют."""
+    cache.set(pin_key(user), True, settings.DB_REPLICA_PIN_SECONDS)
+
+
+def is_pinned(user):
+    return user.is_authenticated and cache.get(pin_key(user)) is not None
+
+
+class ReplicaRouter:
+    """Направляет чтение в реплику, выбранную для запроса, запись — в
+    основную базу."""
+
+    def db_for_read(self, model, **hints):
+        return read_replica.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaReadMixin:
+    """Выполняет безопасные запросы к вьюсету на одной из реплик.
+
+    Пользователь, недавно что-то изменивший, читает с основной базы,
+    чтобы видеть свои изменения.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        replicas = get_replicas()
+        if (
+            replicas
+            and request.method in SAFE_METHODS
+            and not is_pinned(request.user)
+        ):
+            self.replica_token = read_replica.set(random.choice(replicas))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, "replica_token", None)
+        if token is not None:
+            read_replica.reset(token)
+            self.replica_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -1,9 +1,16 @@
 import base64
+import binascii
+import re
 
-from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.db import transaction
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from rest_framework.serializers import (
+    BooleanField,
+    Field,
+    FloatField,
     ImageField,
+    IntegerField,
     ModelSerializer,
     PrimaryKeyRelatedField,
     ReadOnlyField,
@@ -18,9 +25,30 @@ from recipes.models import (
     Recipe,
     ShoppingCart,
     Tag,
+    TagRecipe,
 )
+from recipes.search import update_search_vector
 from users.models import Follow
 
+from .cache import bump_generation
+
+
+def get_subscribed_authors(request):
+    """Возвращает id авторов, на которых подписан пользователь запроса.
+
+    Множество загружается одним запросом и кэшируется на объекте запроса,
+    поэтому все вложенные сериализаторы ответа используют его повторно.
+    """
+    if not request.user.is_authenticated:
+        return frozenset()
+    if not hasattr(request, "_subscribed_authors"):
+        request._subscribed_authors = frozenset(
+            Follow.objects.filter(user=request.user).values_list(
+                "author_id", flat=True
+            )
+        )
+    return request._subscribed_authors
+
 
 class CustomUserSerializer(UserSerializer):
     """Сериализатор для пользователей."""
@@ -38,12 +66,7 @@ class CustomUserSerializer(UserSerializer):
         )
 
     def get_is_subscribed(self, obj):
-        return (
-            self.context["request"].user.is_authenticated
-            and Follow.objects.filter(
-                user=self.context["request"].user, author=obj
-            ).exists()
-        )
+        return obj.id in get_subscribed_authors(self.context["request"])
 
 
 class UserRegistrationSerializer(UserCreateSerializer):
@@ -61,16 +84,60 @@ class UserRegistrationSerializer(UserCreateSerializer):
 
 
 class Base64ImageField(ImageField):
-    """Кастомный тип поля для изображений."""
+    """Кастомный тип поля для изображений.
+
+    Картинка декодируется частями во временный файл на диске, поэтому
+    полный декодированный файл не держится в памяти. Переносы строк и
+    другие символы вне алфавита base64 отбрасываются, а декодируется
+    всегда кратное четырём число символов, как при разборе строки целиком.
+    """
+
+    chunk_size = 64 * 1024
+    skipped = re.compile(r"[^A-Za-z0-9+/=]")
 
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith("data:image"):
-            format, imgstr = data.split(";base64,")
-            ext = format.split("/")[-1]
-            data = ContentFile(base64.b64decode(imgstr), name="temp." + ext)
+            start = data.index(";base64,")
+            ext = data[:start].split("/")[-1]
+            start += len(";base64,")
+            upload = TemporaryUploadedFile(
+                "temp." + ext, "image/" + ext, 0, None
+            )
+            buffer = ""
+            try:
+                for offset in range(start, len(data), self.chunk_size):
+                    buffer += self.skipped.sub(
+                        "", data[offset:offset + self.chunk_size]
+                    )
+                    size = len(buffer) - len(buffer) % 4
+                    upload.write(base64.b64decode(buffer[:size]))
+                    buffer = buffer[size:]
+                upload.write(base64.b64decode(buffer))
+            except binascii.Error:
+                self.fail("invalid_image")
+            upload.size = upload.tell()
+            upload.seek(0)
+            data = upload
         return super().to_internal_value(data)
 
 
+class ImageRenditionField(Field):
+    """Поле со ссылкой на уменьшенную копию картинки рецепта."""
+
+    def __init__(self, rendition, **kwargs):
+        self.rendition = rendition
+        kwargs["source"] = "*"
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        url = value.get_image_url(self.rendition)
+        request = self.context.get("request")
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
+
+
 class TagSerializer(ModelSerializer):
     """Сериализатор для тэгов."""
 
@@ -107,8 +174,9 @@ class RecipeSerializer(ModelSerializer):
     ingredients = IngredientRecipeSerializer(
         source="ingredients_recipes", many=True
     )
-    is_favorited = SerializerMethodField()
-    is_in_shopping_cart = SerializerMethodField()
+    is_favorited = BooleanField(read_only=True)
+    is_in_shopping_cart = BooleanField(read_only=True)
+    image = ImageRenditionField("card")
 
     class Meta:
         model = Recipe
@@ -125,21 +193,21 @@ class RecipeSerializer(ModelSerializer):
             "cooking_time",
         )
 
-    def get_is_favorited(self, obj):
-        return (
-            self.context["request"].user.is_authenticated
-            and Favorite.objects.filter(
-                user=self.context["request"].user, recipe=obj
-            ).exists()
-        )
 
-    def get_is_in_shopping_cart(self, obj):
-        return (
-            self.context["request"].user.is_authenticated
-            and ShoppingCart.objects.filter(
-                user=self.context["request"].user, recipe=obj
-            ).exists()
-        )
+class CookableRecipeSerializer(RecipeSerializer):
+    """Сериализатор для рецептов, подобранных по ингредиентам."""
+
+    coverage = FloatField(read_only=True)
+    missing_count = IntegerField(read_only=True)
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + ("coverage", "missing_count")
+
+
+class RecipeDetailSerializer(RecipeSerializer):
+    """Сериализатор для страницы рецепта."""
+
+    image = ImageRenditionField("detail")
 
 
 class IngredientRecipeCreateSerializer(ModelSerializer):
@@ -172,35 +240,108 @@ class RecipeCreateUpdateSerializer(ModelSerializer):
             "cooking_time",
         )
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients_data = validated_data.pop("ingredients")
+        tags = validated_data.pop("tags")
         recipe = super().create(validated_data)
-        for ingredient_data in ingredients_data:
+        # Временный файл картинки уже перенесён в хранилище.
+        validated_data["image"].close()
+        TagRecipe.objects.bulk_create(
+            TagRecipe(recipe=recipe, tag=tag) for tag in tags
+        )
+        IngredientRecipe.objects.bulk_create(
             IngredientRecipe(
                 recipe=recipe,
                 ingredient=ingredient_data["ingredient"],
                 amount=ingredient_data["amount"],
-            ).save()
+            )
+            for ingredient_data in ingredients_data
+        )
+        update_search_vector(Recipe.objects.filter(id=recipe.id))
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        if "ingredients" not in self.initial_data:
-            recipe = super().update(instance, validated_data)
-            return recipe
-        ingredients_data = validated_data.pop("ingredients")
+        ingredients_data = validated_data.pop("ingredients", None)
+        tags = validated_data.pop("tags", None)
         recipe = super().update(instance, validated_data)
-        IngredientRecipe.objects.filter(recipe=recipe).delete()
-        for ingredient_data in ingredients_data:
-            IngredientRecipe(
-                recipe=recipe,
-                ingredient=ingredient_data["ingredient"],
-                amount=ingredient_data["amount"],
-            ).save()
+        if "image" in validated_data:
+            validated_data["image"].close()
+        if tags is not None:
+            self.update_tags(recipe, tags)
+        if ingredients_data is not None:
+            self.update_ingredients(recipe, ingredients_data)
+            update_search_vector(Recipe.objects.filter(id=recipe.id))
         return recipe
 
+    @staticmethod
+    def update_tags(recipe, tags):
+        """Удаляет и добавляет только изменившиеся теги рецепта."""
+        new_ids = {tag.id for tag in tags}
+        old_ids = set(
+            TagRecipe.objects.filter(recipe=recipe).values_list(
+                "tag_id", flat=True
+            )
+        )
+        if old_ids - new_ids:
+            TagRecipe.objects.filter(
+                recipe=recipe, tag_id__in=old_ids - new_ids
+            ).delete()
+        TagRecipe.objects.bulk_create(
+            TagRecipe(recipe=recipe, tag_id=tag_id)
+            for tag_id in new_ids - old_ids
+        )
+
+    @staticmethod
+    def update_ingredients(recipe, ingredients_data):
+        """Удаляет, добавляет и изменяет только изменившиеся ингредиенты."""
+        amounts = {
+            ingredient_data["ingredient"].id: ingredient_data["amount"]
+            for ingredient_data in ingredients_data
+        }
+        old = {
+            ingredient_recipe.ingredient_id: ingredient_recipe
+            for ingredient_recipe in IngredientRecipe.objects.filter(
+                recipe=recipe
+            )
+        }
+        if old.keys() - amounts.keys():
+            IngredientRecipe.objects.filter(
+                recipe=recipe, ingredient_id__in=old.keys() - amounts.keys()
+            ).delete()
+        changed = []
+        for ingredient_id, ingredient_recipe in old.items():
+            amount = amounts.get(ingredient_id)
+            if amount is not None and amount != ingredient_recipe.amount:
+                ingredient_recipe.amount = amount
+                changed.append(ingredient_recipe)
+        if changed:
+            IngredientRecipe.objects.bulk_update(changed, ("amount",))
+        added = [
+            IngredientRecipe(
+                recipe=recipe, ingredient_id=ingredient_id, amount=amount
+            )
+            for ingredient_id, amount in amounts.items()
+            if ingredient_id not in old
+        ]
+        if added:
+            IngredientRecipe.objects.bulk_create(added)
+            # bulk_create не отправляет сигналы, индекс сбрасывается здесь.
+            transaction.on_commit(
+                lambda: bump_generation("recipe_ingredients")
+            )
+
     def to_representation(self, instance):
-        serializer = RecipeSerializer(
-            instance, context={"request": self.context["request"]}
+        request = self.context["request"]
+        instance = (
+            Recipe.objects.with_user_flags(request.user)
+            .select_related("author")
+            .prefetch_related("ingredients_recipes__ingredient", "tags")
+            .get(pk=instance.pk)
+        )
+        serializer = RecipeDetailSerializer(
+            instance, context={"request": request}
         )
         return serializer.data
 
@@ -237,6 +378,8 @@ class RecipeCreateUpdateSerializer(ModelSerializer):
 class FollowRecipeSerializer(ModelSerializer):
     """Родительский сереализатор для подписок."""
 
+    image = ImageRenditionField("preview")
+
     class Meta:
         model = Recipe
         fields = ("id", "name", "image", "cooking_time")
@@ -275,7 +418,7 @@ class FollowSerializer(ModelSerializer):
     last_name = ReadOnlyField(source="author.last_name")
     is_subscribed = SerializerMethodField()
     recipes = FollowRecipeSerializer(source="author.recipes", many=True)
-    recipes_count = SerializerMethodField()
+    recipes_count = ReadOnlyField(source="author.recipes_count")
 
     class Meta:
         model = Follow
@@ -291,9 +434,4 @@ class FollowSerializer(ModelSerializer):
         )
 
     def get_is_subscribed(self, obj):
-        return Follow.objects.filter(
-            user=self.context["request"].user, author=obj.author
-        ).exists()
-
-    def get_recipes_count(self, obj):
-        return Recipe.objects.filter(author=obj.author).count()
+        return obj.user_id == self.context["request"].user.id
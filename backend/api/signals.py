@@ -0,0 +1,89 @@
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from recipes.models import (
+    Ingredient,
+    IngredientRecipe,
+    Recipe,
+    Tag,
+    TagRecipe,
+)
+from users.models import User
+
+from .authentication import token_cache
+from .cache import bump_generation
+from .connections import check_connections
+from .metrics import registry
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def invalidate_tags(**kwargs):
+    bump_generation("tags")
+    bump_generation("recipes")
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredients(**kwargs):
+    bump_generation("ingredients")
+    bump_generation("recipes")
+
+
+@receiver(post_save, sender=Recipe)
+def invalidate_new_recipe_ingredients(created, **kwargs):
+    # Ингредиенты нового рецепта пишутся через bulk_create без сигналов,
+    # поэтому его создание сбрасывает индекс после фиксации транзакции.
+    # Правка полей существующего рецепта состав не меняет.
+    if created:
+        transaction.on_commit(lambda: bump_generation("recipe_ingredients"))
+
+
+@receiver((post_save, post_delete), sender=IngredientRecipe)
+def invalidate_recipe_ingredients(**kwargs):
+    transaction.on_commit(lambda: bump_generation("recipe_ingredients"))
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+@receiver((post_save, post_delete), sender=TagRecipe)
+@receiver((post_save, post_delete), sender=IngredientRecipe)
+def invalidate_recipes(**kwargs):
+    transaction.on_commit(lambda: bump_generation("recipes"))
+
+
+@receiver(request_started)
+def check_db_connections(**kwargs):
+    check_connections()
+
+
+@receiver(connection_created)
+def count_db_connection(connection, **kwargs):
+    if settings.API_INSTRUMENTATION:
+        registry.increase(
+            "api_db_connections_created_total",
+            (("alias", connection.alias),),
+        )
+
+
+@receiver(post_delete, sender=Token)
+def forget_token(instance, **kwargs):
+    transaction.on_commit(lambda: token_cache.delete(instance.key))
+
+
+@receiver(post_save, sender=User)
+def forget_user_tokens(instance, created, **kwargs):
+    # Смена пароля, блокировка и правка профиля сохраняют пользователя.
+    if created:
+        return
+    keys = list(
+        Token.objects.filter(user=instance).values_list("key", flat=True)
+    )
+
+    def forget():
+        for key in keys:
+            token_cache.delete(key)
+
+    transaction.on_commit(forget)
@@ -2,7 +2,9 @@ from django.urls import include, path
 from rest_framework import routers
 
 from .views import (
+    CookableRecipeViewSet,
     FavoriteViewSet,
+    FeedViewSet,
     FollowViewSet,
     IngredientViewSet,
     RecipeViewSet,
@@ -24,6 +26,11 @@ urlpatterns = [
         "recipes/<int:id>/favorite/",
         FavoriteViewSet.as_view({"post": "create", "delete": "destroy"}),
     ),
+    path(
+        "recipes/cookable/",
+        CookableRecipeViewSet.as_view({"get": "list"}),
+    ),
+    path("recipes/feed/", FeedViewSet.as_view({"get": "list"})),
     path(
         "recipes/download_shopping_cart/",
         ShoppingCartViewSet.as_view({"get": "retrieve"}),
@@ -1,16 +1,26 @@
-from django.http import HttpResponse
+from django.db import transaction
+from django.db.models import Prefetch, Sum, prefetch_related_objects
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.filters import SearchFilter
-from rest_framework.permissions import IsAuthenticatedOrReadOnly
+from rest_framework.permissions import (
+    IsAuthenticated,
+    IsAuthenticatedOrReadOnly,
+)
 from rest_framework.response import Response
 from rest_framework.status import (
     HTTP_201_CREATED,
     HTTP_204_NO_CONTENT,
     HTTP_400_BAD_REQUEST,
 )
-from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet, ViewSet
+from rest_framework.viewsets import (
+    GenericViewSet,
+    ModelViewSet,
+    ReadOnlyModelViewSet,
+    ViewSet,
+)
 
+from recipes.feed import filter_feed
 from recipes.models import (
     Favorite,
     Ingredient,
@@ -21,43 +31,87 @@ from recipes.models import (
 )
 from users.models import Follow, User
 
+from .cache import CachedReadOnlyMixin
+from .concurrency import run_parallel
 from .filters import RecipeFilter
+from .indexes import ingredient_index, recipe_ingredient_index
+from .paginations import CursorPaginationMixin, CustomCursorPagination
 from .permissions import IsAuthorPatchDelete
+from .renderers import (
+    FileContentNegotiation,
+    ShoppingCartCSVRenderer,
+    ShoppingCartTXTRenderer,
+)
+from .routers import ReplicaReadMixin
 from .serializers import (
+    CookableRecipeSerializer,
     CustomUserSerializer,
     FavoriteSerializer,
     FollowSerializer,
     IngredientSerializer,
     RecipeCreateUpdateSerializer,
+    RecipeDetailSerializer,
     RecipeSerializer,
     ShoppingCartSerializer,
     TagSerializer,
+    get_subscribed_authors,
 )
 
+# Эти поля меняются запросами UPDATE в обход экземпляра, поэтому при
+# правке рецепта они не загружаются и save() не перезапишет их
+# значениями на момент начала запроса.
+RECIPE_DEFERRED_FIELDS = (
+    "favorites_count",
+    "in_carts_count",
+    "trending_score",
+    "trending_updated",
+    "rendered_image",
+    "search_vector",
+)
 
-class TagViewSet(ReadOnlyModelViewSet):
+
+class TagViewSet(
+    ReplicaReadMixin, CachedReadOnlyMixin, ReadOnlyModelViewSet
+):
     """Вьюсет для тэгов."""
 
+    cache_name = "tags"
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
     permission_classes = (IsAuthenticatedOrReadOnly,)
 
 
-class IngredientViewSet(ReadOnlyModelViewSet):
+class IngredientViewSet(
+    ReplicaReadMixin, CachedReadOnlyMixin, ReadOnlyModelViewSet
+):
     """Вьюсет для ингредиентов."""
 
+    cache_name = "ingredients"
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     pagination_class = None
     permission_classes = (IsAuthenticatedOrReadOnly,)
-    filter_backends = (SearchFilter,)
-    search_fields = ("^name",)
-
 
-class RecipeViewSet(ModelViewSet):
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get("name")
+        if not name:
+            return super().list(request, *args, **kwargs)
+        limit = request.query_params.get("limit")
+        limit = int(limit) if limit is not None and limit.isdigit() else None
+        return Response(ingredient_index.search(name, limit))
+
+
+class RecipeViewSet(
+    ReplicaReadMixin,
+    CachedReadOnlyMixin,
+    CursorPaginationMixin,
+    ModelViewSet,
+):
     """Вьюсет для рецептов."""
 
+    cache_name = "recipes"
+    cache_anonymous_only = True
     queryset = Recipe.objects.all()
     serializer_class = RecipeSerializer
     permission_classes = (IsAuthorPatchDelete,)
@@ -68,26 +122,116 @@ class RecipeViewSet(ModelViewSet):
         serializer.save(author=self.request.user)
 
     def get_queryset(self):
-        return Recipe.objects.prefetch_related(
-            "ingredients_recipes__ingredient", "tags"
-        ).all()
+        queryset = (
+            Recipe.objects.with_user_flags(self.request.user)
+            .select_related("author")
+            .prefetch_related("ingredients_recipes__ingredient", "tags")
+        )
+        if self.action in ("update", "partial_update"):
+            queryset = queryset.defer(*RECIPE_DEFERRED_FIELDS)
+        return queryset
 
     def get_serializer_class(self):
-        if self.action == "create" or "update":
+        if self.action in ("create", "update", "partial_update"):
             return RecipeCreateUpdateSerializer
+        if self.action == "retrieve":
+            return RecipeDetailSerializer
         return RecipeSerializer
 
-    def retrieve(self, request, pk):
-        instance = get_object_or_404(Recipe, id=pk)
-        serializer = RecipeSerializer(instance, context={"request": request})
-        return Response(serializer.data)
+    def get_parallel_queries(self):
+        """Запросы, которые пагинатор выполняет вместе со страницей."""
+        if not self.request.user.is_authenticated:
+            return ()
+        return (lambda: get_subscribed_authors(self.request),)
+
+    def get_object(self):
+        if self.action != "retrieve":
+            return super().get_object()
+        result, *_ = run_parallel(
+            super().get_object, *self.get_parallel_queries()
+        )
+        return result
+
+
+class CookableRecipeViewSet(ReplicaReadMixin, GenericViewSet):
+    """Вьюсет для подбора рецептов по имеющимся ингредиентам."""
+
+    queryset = Recipe.objects.all()
+    serializer_class = CookableRecipeSerializer
+    permission_classes = (IsAuthenticatedOrReadOnly,)
+    filter_backends = (DjangoFilterBackend,)
+    filterset_class = RecipeFilter
+
+    def get_queryset(self):
+        return (
+            Recipe.objects.with_user_flags(self.request.user)
+            .select_related("author")
+            .prefetch_related("ingredients_recipes__ingredient", "tags")
+        )
+
+    def filter_matches(self, request, matches):
+        """Оставляет рецепты, прошедшие фильтры RecipeFilter.
+
+        Фильтры проверяются одним запросом только для подобранных
+        рецептов.
+        """
+        if not any(
+            name in request.query_params
+            for name in self.filterset_class.base_filters
+        ):
+            return matches
+        allowed = set(
+            self.filter_queryset(Recipe.objects.all())
+            .filter_ids([recipe_id for recipe_id, _, _ in matches])
+            .order_by()
+            .values_list("id", flat=True)
+        )
+        return [match for match in matches if match[0] in allowed]
 
     def list(self, request):
-        queryset = self.filter_queryset(self.get_queryset())
-        page = self.paginate_queryset(queryset)
-        serializer = self.get_serializer(
-            page, many=True, context={"request": request}
+        ingredient_ids = request.query_params.getlist("ingredients")
+        if not ingredient_ids or not all(
+            ingredient_id.isdigit() for ingredient_id in ingredient_ids
+        ):
+            return Response(
+                {"errors": "Укажите id имеющихся ингредиентов."},
+                status=HTTP_400_BAD_REQUEST,
+            )
+        matches = recipe_ingredient_index.match(map(int, ingredient_ids))
+        page = self.paginate_queryset(self.filter_matches(request, matches))
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for recipe_id, _, _ in page]
+        )
+        results = []
+        for recipe_id, found, total in page:
+            recipe = recipes.get(recipe_id)
+            if recipe is not None:
+                recipe.coverage = found / total
+                recipe.missing_count = total - found
+                results.append(recipe)
+        serializer = self.get_serializer(results, many=True)
+        return self.get_paginated_response(serializer.data)
+
+
+class FeedViewSet(ReplicaReadMixin, GenericViewSet):
+    """Вьюсет для ленты рецептов авторов из подписок."""
+
+    queryset = Recipe.objects.all()
+    serializer_class = RecipeSerializer
+    permission_classes = (IsAuthenticated,)
+    pagination_class = CustomCursorPagination
+
+    def get_queryset(self):
+        return filter_feed(
+            Recipe.objects.with_user_flags(self.request.user)
+            .select_related("author")
+            .prefetch_related("ingredients_recipes__ingredient", "tags"),
+            self.request.user,
         )
+
+    def list(self, request):
+        page = self.paginate_queryset(self.get_queryset())
+        serializer = self.get_serializer(page, many=True)
         return self.get_paginated_response(serializer.data)
 
 
@@ -100,6 +244,7 @@ class FavoriteShoppingCartViewSet(ModelViewSet):
     def get_queryset(self):
         return self.queryset.filter(user=self.request.user)
 
+    @transaction.atomic
     def create(self, request, id):
         recipe = get_object_or_404(Recipe, id=id)
         if self.queryset.filter(user=request.user, recipe=recipe).exists():
@@ -111,6 +256,7 @@ class FavoriteShoppingCartViewSet(ModelViewSet):
         serializer = self.get_serializer(data)
         return Response(serializer.data, status=HTTP_201_CREATED)
 
+    @transaction.atomic
     def destroy(self, request, id):
         recipe = get_object_or_404(Recipe, id=id)
         if self.queryset.filter(user=request.user, recipe=recipe).exists():
@@ -135,41 +281,69 @@ class ShoppingCartViewSet(FavoriteShoppingCartViewSet):
     queryset = ShoppingCart.objects.all()
     serializer_class = ShoppingCartSerializer
 
+    def get_renderers(self):
+        if self.action == "retrieve":
+            return [ShoppingCartTXTRenderer(), ShoppingCartCSVRenderer()]
+        return super().get_renderers()
+
+    def get_content_negotiator(self):
+        # Вызывается до того, как DRF определит self.action.
+        if self.action_map.get(self.request.method.lower()) == "retrieve":
+            return FileContentNegotiation()
+        return super().get_content_negotiator()
+
     def retrieve(self, request):
-        shopping_cart = {}
-        ingredients_recipes = IngredientRecipe.objects.filter(
-            recipe__shoppingcart__user=request.user
+        ingredients = (
+            IngredientRecipe.objects.filter(
+                recipe__shoppingcart__user=request.user
+            )
+            .values("ingredient__name", "ingredient__measurement_unit")
+            .annotate(total_amount=Sum("amount"))
+            .order_by("ingredient__name")
         )
-        for ingredient_recipe in ingredients_recipes:
-            if ingredient_recipe.ingredient.name in shopping_cart.keys():
-                shopping_cart[ingredient_recipe.ingredient.name][
-                    1
-                ] += ingredient_recipe.amount
-            else:
-                shopping_cart[ingredient_recipe.ingredient.name] = [
-                    ingredient_recipe.ingredient.measurement_unit,
-                    ingredient_recipe.amount,
-                ]
-        content = ""
-        for ingredient, values in shopping_cart.items():
-            content += f"{ingredient} ({values[0]}) — {values[1]}\n"
-        return HttpResponse(content, content_type="text/plain")
-
-
-class FollowViewSet(ModelViewSet):
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            renderer.stream(ingredients.iterator()),
+            content_type=f"{renderer.media_type}; charset={renderer.charset}",
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="shopping_cart.{renderer.format}"'
+        )
+        return response
+
+
+class FollowViewSet(ReplicaReadMixin, CursorPaginationMixin, ModelViewSet):
     """Вьюсет для подписок."""
 
     queryset = Follow.objects.all()
     serializer_class = FollowSerializer
 
+    def get_queryset(self):
+        return Follow.objects.filter(user=self.request.user).select_related(
+            "author"
+        )
+
+    def prefetch_recipes(self, follows):
+        """Подгружает рецепты авторов с учётом recipes_limit."""
+        authors = [follow.author for follow in follows]
+        recipes = Recipe.objects.filter(author__in=authors)
+        recipes_limit = self.request.query_params.get("recipes_limit")
+        if recipes_limit is not None and recipes_limit.isdigit():
+            recipes = recipes.limit_per_author(int(recipes_limit))
+        prefetch_related_objects(
+            authors, Prefetch("recipes", queryset=recipes)
+        )
+
     def list(self, request):
-        queryset = Follow.objects.filter(user=request.user)
+        queryset = self.get_queryset()
         page = self.paginate_queryset(queryset)
+        self.prefetch_recipes(page)
         serializer = FollowSerializer(
             page, many=True, context={"request": request}
         )
         return self.get_paginated_response(serializer.data)
 
+    @transaction.atomic
     def create(self, request, id):
         user = get_object_or_404(User, id=id)
         if Follow.objects.filter(user=request.user, author=user).exists():
@@ -183,9 +357,12 @@ class FollowViewSet(ModelViewSet):
                 status=HTTP_400_BAD_REQUEST,
             )
         data = Follow.objects.create(user=request.user, author=user)
+        data = self.get_queryset().get(pk=data.pk)
+        self.prefetch_recipes([data])
         serializer = FollowSerializer(data, context={"request": request})
         return Response(serializer.data, HTTP_201_CREATED)
 
+    @transaction.atomic
     def destroy(self, request, id):
         user = get_object_or_404(User, id=id)
         if Follow.objects.filter(user=request.user, author=user).exists():
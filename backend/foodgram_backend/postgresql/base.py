@@ -0,0 +1,19 @@
+from django.db.backends.postgresql import base
+
+from api.connections import check_connection
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """PostgreSQL с проверкой постоянного соединения при первом запросе
+    к нему после начала обработки, как CONN_HEALTH_CHECKS в Django 4.1.
+
+    Соединения, которые запрос не использует, не проверяются.
+    """
+
+    health_check_pending = False
+
+    def _cursor(self, name=None):
+        if self.health_check_pending:
+            self.health_check_pending = False
+            check_connection(self)
+        return super()._cursor(name)
@@ -40,6 +40,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "recipes.apps.RecipesConfig",
     "users.apps.UsersConfig",
     "api.apps.ApiConfig",
@@ -51,6 +52,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "api.middleware.InstrumentationMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -58,6 +60,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "api.middleware.ReplicaPinMiddleware",
 ]
 
 ROOT_URLCONF = "foodgram_backend.urls"
@@ -84,17 +87,80 @@ WSGI_APPLICATION = "foodgram_backend.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
+# Пулер соединений перед базой, например pgbouncer в режиме transaction.
+DB_POOLER = os.getenv("DB_POOLER", "")
+
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.postgresql",
+        "ENGINE": "foodgram_backend.postgresql",
         "NAME": os.getenv("POSTGRES_DB", "django"),
         "USER": os.getenv("POSTGRES_USER", "django"),
         "PASSWORD": os.getenv("POSTGRES_PASSWORD", ""),
         "HOST": os.getenv("DB_HOST", ""),
         "PORT": os.getenv("DB_PORT", 5432),
+        # Соединение принадлежит потоку воркера и переиспользуется его
+        # следующими запросами, пока не истечёт срок.
+        "CONN_MAX_AGE": int(os.getenv("DB_CONN_MAX_AGE", 60)),
+        # Серверные курсоры не переживают смену соединения пулером
+        # между транзакциями.
+        "DISABLE_SERVER_SIDE_CURSORS": bool(DB_POOLER),
+        "OPTIONS": {
+            "connect_timeout": int(os.getenv("DB_CONNECT_TIMEOUT", 5)),
+        },
+    }
+}
+
+# Реплики для чтения: адреса через пробел в виде host или host:port.
+for index, replica in enumerate(os.getenv("DB_REPLICAS", "").split()):
+    host, _, port = replica.partition(":")
+    DATABASES[f"replica_{index}"] = {
+        **DATABASES["default"],
+        "HOST": host,
+        "PORT": port or DATABASES["default"]["PORT"],
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_ROUTERS = ["api.routers.ReplicaRouter"]
+
+# Сколько секунд после изменений пользователь читает с основной базы.
+DB_REPLICA_PIN_SECONDS = int(os.getenv("DB_REPLICA_PIN_SECONDS", 10))
+
+# Проверять постоянное соединение перед первым запросом к нему.
+DB_HEALTH_CHECKS = os.getenv("DB_HEALTH_CHECKS", "True") == "True"
+
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.getenv("CACHE_LOCATION", ""),
     }
 }
 
+API_CACHE_TIMEOUT = int(os.getenv("API_CACHE_TIMEOUT", 300))
+
+API_INSTRUMENTATION = os.getenv("API_INSTRUMENTATION", "False") == "True"
+
+API_DUPLICATE_QUERY_THRESHOLD = int(
+    os.getenv("API_DUPLICATE_QUERY_THRESHOLD", 5)
+)
+
+# Выбирать страницу, количество и подписки пользователя одновременно
+# в отдельных соединениях. Имеет смысл при постоянных соединениях.
+API_PARALLEL_QUERIES = os.getenv("API_PARALLEL_QUERIES", "False") == "True"
+
+API_PARALLEL_WORKERS = int(os.getenv("API_PARALLEL_WORKERS", 4))
+
+# Кэш токенов: срок жизни записи, размер кэша процесса и хранение
+# в общем кэше Django вместо памяти процесса.
+AUTH_TOKEN_CACHE_TIMEOUT = int(os.getenv("AUTH_TOKEN_CACHE_TIMEOUT", 60))
+
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", 10000))
+
+AUTH_TOKEN_CACHE_SHARED = (
+    os.getenv("AUTH_TOKEN_CACHE_SHARED", "False") == "True"
+)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -140,6 +206,19 @@ MEDIA_URL = "/media/"
 
 MEDIA_ROOT = BASE_DIR / "media"
 
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", 2))
+
+# Рецепты авторов с большим числом подписчиков не рассылаются по лентам,
+# а читаются напрямую.
+FEED_FANOUT_LIMIT = int(os.getenv("FEED_FANOUT_LIMIT", 1000))
+
+FEED_BACKFILL = int(os.getenv("FEED_BACKFILL", 100))
+
+# Рассылка рецептов автора возобновляется командой refresh_feeds, когда
+# подписчиков становится меньше FEED_FANOUT_LIMIT на FEED_FANOUT_MARGIN:
+# автор на границе лимита не переключается туда и обратно.
+FEED_FANOUT_MARGIN = int(os.getenv("FEED_FANOUT_MARGIN", 100))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
@@ -147,7 +226,7 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework.authentication.TokenAuthentication",
+        "api.authentication.CachedTokenAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
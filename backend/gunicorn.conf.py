@@ -0,0 +1,6 @@
+import os
+
+bind = "0.0.0.0:8000"
+wsgi_app = "foodgram_backend.wsgi:application"
+workers = int(os.getenv("GUNICORN_WORKERS", 2))
+threads = int(os.getenv("GUNICORN_THREADS", 1))
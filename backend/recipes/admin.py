@@ -45,15 +45,11 @@ class IngredientRecipeInline(admin.TabularInline):
 
 
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ("name", "author")
+    list_display = ("name", "author", "favorites_count")
     search_fields = ("name",)
     list_filter = ("author", "tags")
     inlines = (TagRecipeInline, IngredientRecipeInline)
-    readonly_fields = ("favorite_count",)
-
-    @admin.display(description="Колличество добавлений в избранное")
-    def favorite_count(self, instance):
-        return Favorite.objects.filter(recipe=instance).count()
+    readonly_fields = ("favorites_count", "in_carts_count")
 
 
 class IngredientAdmin(admin.ModelAdmin):
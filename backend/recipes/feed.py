@@ -0,0 +1,99 @@
+from django.conf import settings
+from django.db.models import Q
+
+from users.models import Follow, User
+
+from .models import FeedItem, Recipe
+
+BATCH_SIZE = 1000
+
+
+def is_fanned_out(author):
+    """Проверяет, рассылаются ли рецепты автора по лентам подписчиков."""
+    return author.feed_fanned_out
+
+
+def stop_fan_out(author_ids=None):
+    """Прекращает рассылку рецептов авторов, у которых подписчиков
+    больше FEED_FANOUT_LIMIT. Их рецепты читаются напрямую."""
+    authors = User.objects.filter(
+        feed_fanned_out=True, followers_count__gt=settings.FEED_FANOUT_LIMIT
+    )
+    if author_ids is not None:
+        authors = authors.filter(id__in=author_ids)
+    return authors.update(feed_fanned_out=False)
+
+
+def resume_fan_out(author):
+    """Возобновляет рассылку рецептов автора и раскладывает его последние
+    рецепты по лентам подписчиков.
+
+    Флаг ставится до раскладки: рецепты, опубликованные во время неё,
+    разошлются сами, а уже опубликованные попадут в раскладку.
+    """
+    User.objects.filter(id=author.id).update(feed_fanned_out=True)
+    backfill(
+        Follow.objects.filter(author=author)
+        .values_list("user_id", flat=True)
+        .iterator(),
+        author.id,
+    )
+
+
+def fan_out(recipe):
+    """Добавляет новый рецепт в ленты подписчиков автора."""
+    followers = Follow.objects.filter(author_id=recipe.author_id).values_list(
+        "user_id", flat=True
+    )
+    FeedItem.objects.bulk_create(
+        (
+            FeedItem(user_id=user_id, recipe_id=recipe.id)
+            for user_id in followers.iterator()
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill(user_ids, author_id):
+    """Добавляет последние рецепты автора в ленты пользователей."""
+    recipe_ids = list(
+        Recipe.objects.filter(author_id=author_id)
+        .order_by("-id")
+        .values_list("id", flat=True)[: settings.FEED_BACKFILL]
+    )
+    FeedItem.objects.bulk_create(
+        (
+            FeedItem(user_id=user_id, recipe_id=recipe_id)
+            for user_id in user_ids
+            for recipe_id in recipe_ids
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def remove_author(user_id, author_id):
+    """Убирает рецепты автора из ленты пользователя."""
+    FeedItem.objects.filter(
+        user_id=user_id, recipe__author_id=author_id
+    ).delete()
+
+
+def filter_feed(queryset, user):
+    """Оставляет в выборке рецепты из ленты пользователя.
+
+    Рецепты обычных авторов берутся из таблицы ленты, рецепты авторов,
+    по которым рассылка остановлена, читаются напрямую.
+    """
+    popular = list(
+        Follow.objects.filter(
+            user=user, author__feed_fanned_out=False
+        ).values_list("author_id", flat=True)
+    )
+    if not popular:
+        return queryset.filter(feed_items__user=user)
+    return queryset.filter(
+        Q(id__in=FeedItem.objects.filter(user=user).values("recipe_id"))
+        | Q(author_id__in=popular)
+    )
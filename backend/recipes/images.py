@@ -0,0 +1,84 @@
+import logging
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+RENDITIONS = {
+    "card": (480, 480),
+    "detail": (1200, 1200),
+    "preview": (160, 160),
+}
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.IMAGE_WORKERS, thread_name_prefix="renditions"
+)
+
+
+def rendition_name(name, rendition):
+    """Возвращает имя файла обработанной копии изображения."""
+    directory, filename = posixpath.split(name)
+    stem = posixpath.splitext(filename)[0]
+    return posixpath.join(
+        directory, "renditions", f"{stem}_{rendition}.webp"
+    )
+
+
+def render_image(storage, name):
+    """Сохраняет уменьшенные копии изображения в формате WebP.
+
+    Копии кладутся в хранилище по умолчанию под именами, выведенными из
+    имени оригинала, и не пересоздаются, если уже есть.
+    """
+    paths = {
+        rendition: rendition_name(name, rendition) for rendition in RENDITIONS
+    }
+    if all(default_storage.exists(path) for path in paths.values()):
+        return
+    with storage.open(name) as file, Image.open(file) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert(
+                "RGBA" if "transparency" in image.info else "RGB"
+            )
+        for rendition, size in RENDITIONS.items():
+            copy = image.copy()
+            copy.thumbnail(size)
+            buffer = BytesIO()
+            copy.save(buffer, "WEBP", quality=80)
+            default_storage.delete(paths[rendition])
+            default_storage.save(
+                paths[rendition], ContentFile(buffer.getvalue())
+            )
+
+
+def render_recipe_image(queryset, name):
+    """Готовит копии изображения и отмечает рецепты обработанными."""
+    render_image(queryset.model._meta.get_field("image").storage, name)
+    return queryset.filter(image=name).update(rendered_image=name)
+
+
+def process_recipe_image(queryset, name):
+    """Обрабатывает изображение рецепта в фоновом потоке."""
+    try:
+        render_recipe_image(queryset, name)
+    except Exception:
+        logger.exception("Не удалось обработать изображение %s", name)
+    finally:
+        connection.close()
+
+
+def schedule_recipe_image(recipe):
+    """Ставит обработку изображения рецепта в фоновый пул."""
+    executor.submit(
+        process_recipe_image,
+        type(recipe).objects.filter(id=recipe.id),
+        recipe.image.name,
+    )
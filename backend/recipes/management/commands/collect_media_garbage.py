@@ -0,0 +1,69 @@
+import posixpath
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from recipes.images import RENDITIONS, rendition_name
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        "Удаляет картинки рецептов и их копии, на которые не ссылается "
+        "ни один рецепт."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--min-age",
+            type=int,
+            default=3600,
+            help="Не трогать файлы моложе указанного числа секунд.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Только показать файлы, которые будут удалены.",
+        )
+
+    def collect(self, storage, directory, referenced, deadline, dry_run):
+        removed = 0
+        if not storage.exists(directory):
+            return removed
+        for filename in storage.listdir(directory)[1]:
+            name = posixpath.join(directory, filename)
+            if name in referenced:
+                continue
+            if storage.get_modified_time(name) > deadline:
+                continue
+            self.stdout.write(name)
+            if not dry_run:
+                storage.delete(name)
+            removed += 1
+        return removed
+
+    def handle(self, *args, **options):
+        field = Recipe._meta.get_field("image")
+        directory = field.upload_to.rstrip("/")
+        images = set(Recipe.objects.values_list("image", flat=True))
+        renditions = {
+            rendition_name(name, rendition)
+            for name in images
+            for rendition in RENDITIONS
+        }
+        deadline = timezone.now() - timedelta(seconds=options["min_age"])
+        removed = self.collect(
+            field.storage, directory, images, deadline, options["dry_run"]
+        )
+        removed += self.collect(
+            default_storage,
+            posixpath.join(directory, "renditions"),
+            renditions,
+            deadline,
+            options["dry_run"],
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f"Неиспользуемых файлов: {removed}.")
+        )
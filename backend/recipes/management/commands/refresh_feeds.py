@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from recipes.feed import resume_fan_out, stop_fan_out
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Переключает рассылку рецептов по лентам: останавливает её для "
+        "авторов, у которых подписчиков больше FEED_FANOUT_LIMIT, и "
+        "возобновляет с раскладкой последних рецептов для авторов, у "
+        "которых их стало меньше лимита на FEED_FANOUT_MARGIN."
+    )
+
+    def handle(self, *args, **options):
+        stopped = stop_fan_out()
+        authors = User.objects.filter(
+            feed_fanned_out=False,
+            followers_count__lte=(
+                settings.FEED_FANOUT_LIMIT - settings.FEED_FANOUT_MARGIN
+            ),
+        )
+        resumed = 0
+        for author in authors.iterator():
+            resume_fan_out(author)
+            resumed += 1
+        self.stdout.write(
+            f"Рассылка остановлена: {stopped}, возобновлена: {resumed}."
+        )
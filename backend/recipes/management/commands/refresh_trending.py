@@ -0,0 +1,116 @@
+import math
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from recipes.models import (
+    Favorite,
+    Recipe,
+    ShoppingCart,
+    TrendingWatermark,
+)
+
+EPOCH = datetime(2023, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def log_sum(scores):
+    """Возвращает log2 суммы степеней двойки без переполнения."""
+    top = max(scores)
+    return top + math.log2(sum(2 ** (score - top) for score in scores))
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает трендовость рецептов по новым добавлениям в "
+        "избранное и список покупок."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--half-life",
+            type=float,
+            default=24,
+            help="Период полураспада активности в часах.",
+        )
+        parser.add_argument(
+            "--overlap",
+            type=int,
+            default=600,
+            help=(
+                "Сколько секунд после добавления событие может оставаться "
+                "незакоммиченным; такие события перечитываются."
+            ),
+        )
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Пересчитать с нуля, а не только новые события.",
+        )
+
+    def read_events(self, model, half_life, settled, scores):
+        """Добавляет в scores ещё не учтённые события таблицы.
+
+        Граница по id сдвигается только до событий старше settled: более
+        поздние могли получить меньший id, чем уже видимые, и закоммититься
+        после этого запуска, поэтому они перечитываются в следующий раз,
+        а повторы отбрасываются по counted_ids.
+        """
+        watermarks = TrendingWatermark.objects.select_for_update()
+        watermark, _ = watermarks.get_or_create(table=model._meta.db_table)
+        counted = set(watermark.counted_ids)
+        last_id = watermark.last_id
+        for event_id, recipe_id, created in (
+            model.objects.filter(id__gt=watermark.last_id)
+            .values_list("id", "recipe_id", "created")
+            .iterator()
+        ):
+            if created <= settled:
+                last_id = max(last_id, event_id)
+            if event_id in counted:
+                continue
+            counted.add(event_id)
+            scores[recipe_id].append(
+                (created - EPOCH).total_seconds() / half_life
+            )
+        watermark.last_id = last_id
+        watermark.counted_ids = sorted(
+            event_id for event_id in counted if event_id > last_id
+        )
+        watermark.save(update_fields=("last_id", "counted_ids"))
+
+    def handle(self, *args, **options):
+        half_life = options["half_life"] * 3600
+        # Без границ неизвестно, какие события уже учтены в трендовости,
+        # поэтому первый запуск пересчитывает её с нуля.
+        full = options["full"] or not TrendingWatermark.objects.exists()
+        now = timezone.now()
+        settled = now - timedelta(seconds=options["overlap"])
+        scores = defaultdict(list)
+        with transaction.atomic():
+            if full:
+                TrendingWatermark.objects.all().delete()
+                Recipe.objects.update(trending_score=0, trending_updated=None)
+            for model in (Favorite, ShoppingCart):
+                self.read_events(model, half_life, settled, scores)
+            recipes = list(
+                Recipe.objects.filter(id__in=scores).only(
+                    "id", "trending_score", "trending_updated"
+                )
+            )
+            for recipe in recipes:
+                values = scores[recipe.id]
+                if recipe.trending_updated is not None:
+                    values.append(recipe.trending_score)
+                recipe.trending_score = log_sum(values)
+                recipe.trending_updated = now
+            Recipe.objects.bulk_update(
+                recipes,
+                ("trending_score", "trending_updated"),
+                batch_size=1000,
+            )
+        self.stdout.write(
+            self.style.SUCCESS(f"Обновлено рецептов: {len(recipes)}.")
+        )
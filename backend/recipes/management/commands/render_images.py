@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F
+
+from recipes.images import render_recipe_image
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        "Готовит уменьшенные копии картинок рецептов, для которых их ещё "
+        "нет: фоновая обработка теряется при перезапуске процесса."
+    )
+
+    def handle(self, *args, **options):
+        names = list(
+            Recipe.objects.exclude(image="")
+            .exclude(rendered_image=F("image"))
+            .order_by()
+            .values_list("image", flat=True)
+            .distinct()
+        )
+        recipes = failed = 0
+        for name in names:
+            try:
+                recipes += render_recipe_image(Recipe.objects.all(), name)
+            except Exception as error:
+                failed += 1
+                self.stderr.write(f"{name}: {error}")
+        self.stdout.write(
+            f"Обработано картинок: {len(names) - failed}, "
+            f"рецептов: {recipes}, ошибок: {failed}."
+        )
+        if failed:
+            raise CommandError("Не все картинки удалось обработать.")
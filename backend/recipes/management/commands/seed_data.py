@@ -0,0 +1,290 @@
+import random
+from io import BytesIO
+from itertools import accumulate
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from PIL import Image
+
+from api.cache import bump_generation
+from recipes.feed import stop_fan_out
+from recipes.models import (
+    Favorite,
+    FeedItem,
+    Ingredient,
+    IngredientRecipe,
+    Recipe,
+    ShoppingCart,
+    Tag,
+    TagRecipe,
+)
+from recipes.search import update_search_vector
+from users.models import Follow
+
+User = get_user_model()
+
+PASSWORD = "Seed-password-1"
+WORDS = (
+    "суп", "салат", "пирог", "запеканка", "каша", "рагу", "соус",
+    "быстро", "сытно", "легко", "остро", "сладко", "по-домашнему",
+    "духовка", "сковорода", "гриль", "праздник", "завтрак", "ужин",
+)
+
+
+def make_weights(size, skew):
+    """Накопленные веса распределения Ципфа: k-й элемент с весом 1/k^skew.
+
+    При skew=0 распределение равномерное.
+    """
+    return list(accumulate(1 / (rank ** skew) for rank in range(1, size + 1)))
+
+
+class Command(BaseCommand):
+    help = (
+        "Заполняет базу тестовыми пользователями, рецептами, избранным, "
+        "списками покупок и подписками для нагрузочных замеров."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--recipes", type=int, default=10000)
+        parser.add_argument("--tags", type=int, default=10)
+        parser.add_argument(
+            "--ingredients",
+            type=int,
+            default=500,
+            help="Сколько ингредиентов создать, если их нет в базе.",
+        )
+        parser.add_argument(
+            "--ingredients-per-recipe", type=int, nargs=2, default=(3, 12)
+        )
+        parser.add_argument(
+            "--tags-per-recipe", type=int, nargs=2, default=(1, 3)
+        )
+        parser.add_argument("--favorites-per-user", type=int, default=20)
+        parser.add_argument("--carts-per-user", type=int, default=5)
+        parser.add_argument("--follows-per-user", type=int, default=10)
+        parser.add_argument(
+            "--skew",
+            type=float,
+            default=1.0,
+            help=(
+                "Показатель распределения Ципфа для популярности авторов "
+                "и рецептов; 0 — равномерное."
+            ),
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if options["users"] < 2 or options["recipes"] < 1:
+            raise CommandError("Нужны хотя бы 2 пользователя и 1 рецепт.")
+        self.random = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        with transaction.atomic():
+            users = self.create_users(options["users"])
+            tags = self.create_tags(options["tags"])
+            ingredients = self.get_ingredients(options["ingredients"])
+            recipes = self.create_recipes(
+                users, tags, ingredients, options
+            )
+            self.create_relations(users, recipes, options)
+            call_command("reconcile_counters", stdout=self.stdout)
+            stop_fan_out()
+            update_search_vector(Recipe.objects.filter(id__gte=recipes[0]))
+        for name in ("tags", "ingredients", "recipes", "recipe_ingredients"):
+            bump_generation(name)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Создано пользователей: {len(users)}, "
+                f"рецептов: {len(recipes)}. Пароль: {PASSWORD}"
+            )
+        )
+
+    @staticmethod
+    def last_id(model):
+        return model.objects.aggregate(last=Max("id"))["last"] or 0
+
+    def create_users(self, number):
+        start = User.objects.count()
+        last_id = self.last_id(User)
+        password = make_password(PASSWORD)
+        User.objects.bulk_create(
+            (
+                User(
+                    email=f"seed{index}@example.com",
+                    username=f"seed{index}",
+                    first_name="Тест",
+                    last_name=f"Пользователь {index}",
+                    password=password,
+                )
+                for index in range(start, start + number)
+            ),
+            batch_size=self.batch_size,
+        )
+        return list(
+            User.objects.filter(id__gt=last_id)
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+
+    def create_tags(self, number):
+        existing = Tag.objects.count()
+        Tag.objects.bulk_create(
+            Tag(
+                name=f"Тег {index}",
+                color=f"#{index:06X}",
+                slug=f"tag-{index}",
+            )
+            for index in range(existing, number)
+        )
+        return list(Tag.objects.values_list("id", flat=True))
+
+    def get_ingredients(self, number):
+        if not Ingredient.objects.exists():
+            Ingredient.objects.bulk_create(
+                Ingredient(name=f"Ингредиент {index}", measurement_unit="г")
+                for index in range(number)
+            )
+        return list(Ingredient.objects.values_list("id", flat=True))
+
+    def save_image(self):
+        buffer = BytesIO()
+        Image.new("RGB", (64, 64), (200, 120, 40)).save(buffer, "PNG")
+        field = Recipe._meta.get_field("image")
+        return field.storage.save(
+            field.generate_filename(None, "seed.png"),
+            ContentFile(buffer.getvalue()),
+        )
+
+    def create_recipes(self, users, tags, ingredients, options):
+        image = self.save_image()
+        authors = self.random.choices(
+            users,
+            cum_weights=make_weights(len(users), options["skew"]),
+            k=options["recipes"],
+        )
+        start = Recipe.objects.count()
+        last_id = self.last_id(Recipe)
+        Recipe.objects.bulk_create(
+            (
+                Recipe(
+                    author_id=author_id,
+                    name=f"Рецепт {start + index}",
+                    image=image,
+                    text=" ".join(self.random.choices(WORDS, k=12)),
+                    cooking_time=self.random.randint(5, 180),
+                )
+                for index, author_id in enumerate(authors)
+            ),
+            batch_size=self.batch_size,
+        )
+        recipes = list(
+            Recipe.objects.filter(id__gt=last_id)
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+        TagRecipe.objects.bulk_create(
+            (
+                TagRecipe(recipe_id=recipe_id, tag_id=tag_id)
+                for recipe_id in recipes
+                for tag_id in self.random.sample(
+                    tags,
+                    min(
+                        self.random.randint(*options["tags_per_recipe"]),
+                        len(tags),
+                    ),
+                )
+            ),
+            batch_size=self.batch_size,
+        )
+        IngredientRecipe.objects.bulk_create(
+            (
+                IngredientRecipe(
+                    recipe_id=recipe_id,
+                    ingredient_id=ingredient_id,
+                    amount=self.random.randint(1, 500),
+                )
+                for recipe_id in recipes
+                for ingredient_id in self.random.sample(
+                    ingredients,
+                    min(
+                        self.random.randint(
+                            *options["ingredients_per_recipe"]
+                        ),
+                        len(ingredients),
+                    ),
+                )
+            ),
+            batch_size=self.batch_size,
+        )
+        return recipes
+
+    def pick(self, population, weights, number, exclude=None):
+        """Выбирает до number разных элементов с учётом весов."""
+        chosen = set(
+            self.random.choices(population, cum_weights=weights, k=number)
+        )
+        chosen.discard(exclude)
+        return chosen
+
+    def create_relations(self, users, recipes, options):
+        recipe_weights = make_weights(len(recipes), options["skew"])
+        user_weights = make_weights(len(users), options["skew"])
+        for model, per_user in (
+            (Favorite, options["favorites_per_user"]),
+            (ShoppingCart, options["carts_per_user"]),
+        ):
+            model.objects.bulk_create(
+                (
+                    model(user_id=user_id, recipe_id=recipe_id)
+                    for user_id in users
+                    for recipe_id in self.pick(
+                        recipes, recipe_weights, per_user
+                    )
+                ),
+                batch_size=self.batch_size,
+                ignore_conflicts=True,
+            )
+        follows = [
+            (user_id, author_id)
+            for user_id in users
+            for author_id in self.pick(
+                users,
+                user_weights,
+                options["follows_per_user"],
+                exclude=user_id,
+            )
+        ]
+        Follow.objects.bulk_create(
+            (
+                Follow(user_id=user_id, author_id=author_id)
+                for user_id, author_id in follows
+            ),
+            batch_size=self.batch_size,
+            ignore_conflicts=True,
+        )
+        by_author = {}
+        for recipe_id, author_id in (
+            Recipe.objects.filter(id__gte=recipes[0])
+            .order_by("id")
+            .values_list("id", "author_id")
+        ):
+            by_author.setdefault(author_id, []).append(recipe_id)
+        FeedItem.objects.bulk_create(
+            (
+                FeedItem(user_id=user_id, recipe_id=recipe_id)
+                for user_id, author_id in follows
+                for recipe_id in by_author.get(author_id, [])[
+                    -settings.FEED_BACKFILL:
+                ]
+            ),
+            batch_size=self.batch_size,
+            ignore_conflicts=True,
+        )
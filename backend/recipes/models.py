@@ -1,9 +1,17 @@
 from colorfield.fields import ColorField
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
+from django.core.files.storage import default_storage
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import connections, models
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
+from django.utils import timezone
 from django.core.exceptions import ValidationError
 
+from .images import rendition_name
+from .storage import ContentAddressedStorage
+
 User = get_user_model()
 
 NUMBER_OF_SYMBOLS = 15
@@ -53,6 +61,68 @@ class Ingredient(models.Model):
         return self.name[:NUMBER_OF_SYMBOLS]
 
 
+class RecipeQuerySet(models.QuerySet):
+    """Кверисет для рецептов."""
+
+    def with_user_flags(self, user):
+        """Аннотирует флаги избранного и списка покупок для пользователя."""
+        if not user.is_authenticated:
+            return self.annotate(
+                is_favorited=models.Value(
+                    False, output_field=models.BooleanField()
+                ),
+                is_in_shopping_cart=models.Value(
+                    False, output_field=models.BooleanField()
+                ),
+            )
+        return self.annotate(
+            is_favorited=models.Exists(
+                Favorite.objects.filter(
+                    user=user, recipe=models.OuterRef("pk")
+                )
+            ),
+            is_in_shopping_cart=models.Exists(
+                ShoppingCart.objects.filter(
+                    user=user, recipe=models.OuterRef("pk")
+                )
+            ),
+        )
+
+    def filter_ids(self, ids):
+        """Оставляет рецепты с перечисленными id.
+
+        На PostgreSQL список передаётся одним параметром-массивом, поэтому
+        запрос не растёт с числом id и выполняется за одно обращение.
+        """
+        if connections[self.db].vendor != "postgresql":
+            return self.filter(id__in=ids)
+        quote_name = connections[self.db].ops.quote_name
+        return self.extra(
+            where=[
+                f"{quote_name(self.model._meta.db_table)}."
+                f"{quote_name('id')} = ANY(%s)"
+            ],
+            params=[list(ids)],
+        )
+
+    def limit_per_author(self, limit):
+        """Оставляет не более limit последних рецептов каждого автора."""
+        ranked = self.annotate(
+            recipe_rank=models.Window(
+                expression=RowNumber(),
+                partition_by=models.F("author"),
+                order_by=models.F("id").desc(),
+            )
+        ).values("id", "recipe_rank")
+        sql, params = ranked.query.sql_with_params()
+        return self.filter(
+            id__in=RawSQL(
+                f"SELECT id FROM ({sql}) AS ranked WHERE recipe_rank <= %s",
+                (*params, limit),
+            )
+        )
+
+
 class Recipe(models.Model):
     """Модель для рецептов."""
 
@@ -69,12 +139,34 @@ class Recipe(models.Model):
         Ingredient, verbose_name="Ингредиенты", through="IngredientRecipe"
     )
     name = models.CharField("Название", max_length=200)
-    image = models.ImageField("Картинка", upload_to="recipes/")
+    image = models.ImageField(
+        "Картинка", upload_to="recipes/", storage=ContentAddressedStorage()
+    )
+    rendered_image = models.CharField(
+        "Обработанная картинка", max_length=100, blank=True, editable=False
+    )
+    favorites_count = models.PositiveIntegerField(
+        "Количество добавлений в избранное", default=0, editable=False
+    )
+    in_carts_count = models.PositiveIntegerField(
+        "Количество добавлений в список покупок", default=0, editable=False
+    )
+    trending_score = models.FloatField(
+        "Трендовость", default=0, editable=False
+    )
+    trending_updated = models.DateTimeField(
+        "Дата пересчёта трендовости", null=True, editable=False
+    )
+    search_vector = SearchVectorField(
+        "Поисковый вектор", null=True, editable=False
+    )
     text = models.TextField("Описание")
     cooking_time = models.PositiveSmallIntegerField(
         "Время приготовления (в минутах)", validators=(MinValueValidator(1),)
     )
 
+    objects = RecipeQuerySet.as_manager()
+
     class Meta:
         ordering = ("-id",)
         verbose_name = "Рецепт"
@@ -84,10 +176,30 @@ class Recipe(models.Model):
                 fields=("name", "author"), name="unique_recipe"
             ),
         )
+        indexes = (
+            models.Index(
+                fields=("author", "-id"), name="recipe_author_id_idx"
+            ),
+            models.Index(
+                fields=("-favorites_count", "-id"), name="recipe_popular_idx"
+            ),
+            models.Index(
+                fields=("-trending_score", "-id"), name="recipe_trending_idx"
+            ),
+            models.Index(
+                fields=("cooking_time", "-id"), name="recipe_cooking_time_idx"
+            ),
+        )
 
     def __str__(self):
         return self.name[:NUMBER_OF_SYMBOLS]
 
+    def get_image_url(self, rendition):
+        """Ссылка на копию картинки или на оригинал, пока копий нет."""
+        if self.rendered_image != self.image.name:
+            return self.image.url
+        return default_storage.url(rendition_name(self.image.name, rendition))
+
 
 class TagRecipe(models.Model):
     """Связная модель для тегов и рецептов."""
@@ -166,6 +278,9 @@ class FavoriteShoppingCart(models.Model):
         related_name="%(class)s",
         on_delete=models.CASCADE,
     )
+    created = models.DateTimeField(
+        "Дата добавления", default=timezone.now, db_index=True
+    )
 
     class Meta:
         abstract = True
@@ -198,3 +313,52 @@ class ShoppingCart(FavoriteShoppingCart):
                 fields=("user", "recipe"), name="unique_shopping_cart"
             ),
         )
+
+
+class FeedItem(models.Model):
+    """Запись ленты: рецепт автора, на которого подписан пользователь."""
+
+    user = models.ForeignKey(
+        User,
+        verbose_name="Пользователь",
+        related_name="feed_items",
+        on_delete=models.CASCADE,
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        verbose_name="Рецепт",
+        related_name="feed_items",
+        on_delete=models.CASCADE,
+    )
+
+    class Meta:
+        verbose_name = "Запись ленты"
+        verbose_name_plural = "Записи ленты"
+        constraints = (
+            models.UniqueConstraint(
+                fields=("user", "recipe"), name="unique_feed_item"
+            ),
+        )
+
+    def __str__(self):
+        return f"{self.user} — {self.recipe}"
+
+
+class TrendingWatermark(models.Model):
+    """Граница событий таблицы, уже учтённых в трендовости.
+
+    События с id не больше last_id учтены все. Выше границы лежат
+    недавние события, которые могли закоммититься не по порядку id;
+    учтённые из них перечислены в counted_ids.
+    """
+
+    table = models.CharField("Таблица", max_length=64, unique=True)
+    last_id = models.BigIntegerField("Последний учтённый id", default=0)
+    counted_ids = models.JSONField("Учтённые id выше границы", default=list)
+
+    class Meta:
+        verbose_name = "Граница трендовости"
+        verbose_name_plural = "Границы трендовости"
+
+    def __str__(self):
+        return self.table
@@ -0,0 +1,102 @@
+from functools import lru_cache
+
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+    TrigramSimilarity,
+)
+from django.db import connections
+from django.db.models import F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+SEARCH_CONFIG = "russian"
+TRIGRAM_THRESHOLD = 0.3
+
+
+def is_postgresql(using):
+    return connections[using].vendor == "postgresql"
+
+
+@lru_cache(maxsize=None)
+def has_trigram(using):
+    """Проверяет, установлено ли расширение pg_trgm."""
+    with connections[using].cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        return cursor.fetchone() is not None
+
+
+def update_search_vector(recipes):
+    """Пересчитывает поисковый вектор по названию, описанию и ингредиентам.
+
+    Вне PostgreSQL ничего не делает.
+    """
+    from .models import IngredientRecipe
+
+    if not is_postgresql(recipes.db):
+        return
+    ingredients = (
+        IngredientRecipe.objects.filter(recipe=OuterRef("pk"))
+        .order_by()
+        .values("recipe")
+        .annotate(names=StringAgg("ingredient__name", " "))
+        .values("names")
+    )
+    recipes.update(
+        search_vector=SearchVector("name", weight="A", config=SEARCH_CONFIG)
+        + SearchVector("text", weight="B", config=SEARCH_CONFIG)
+        + SearchVector(
+            Coalesce(Subquery(ingredients), Value("")),
+            weight="C",
+            config=SEARCH_CONFIG,
+        )
+    )
+
+
+def search_recipes(queryset, value):
+    """Ищет рецепты по тексту и сортирует их по релевантности.
+
+    Если полнотекстовый поиск ничего не нашёл, ищет похожие названия
+    по триграммам, чтобы находить запросы с опечатками.
+    """
+    if not is_postgresql(queryset.db):
+        return queryset.filter(name__icontains=value)
+    query = SearchQuery(value, config=SEARCH_CONFIG, search_type="websearch")
+    found = (
+        queryset.filter(search_vector=query)
+        .annotate(rank=SearchRank(F("search_vector"), query))
+        .order_by("-rank", "-id")
+    )
+    if found.exists() or not has_trigram(queryset.db):
+        return found
+    return (
+        queryset.annotate(similarity=TrigramSimilarity("name", value))
+        .filter(similarity__gt=TRIGRAM_THRESHOLD)
+        .order_by("-similarity", "-id")
+    )
+
+
+def create_search_indexes(using):
+    """Создаёт GIN-индексы для поиска, которых нет в миграциях."""
+    from .models import Recipe
+
+    if not is_postgresql(using):
+        return
+    table = Recipe._meta.db_table
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS recipe_search_vector_idx "
+            f"ON {table} USING gin (search_vector)"
+        )
+        cursor.execute(
+            "SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'"
+        )
+        if cursor.fetchone() is None:
+            return
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS recipe_name_trgm_idx "
+            f"ON {table} USING gin (name gin_trgm_ops)"
+        )
+    has_trigram.cache_clear()
@@ -0,0 +1,93 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+
+from .feed import fan_out, is_fanned_out
+from .images import schedule_recipe_image
+from .models import (
+    Favorite,
+    Ingredient,
+    IngredientRecipe,
+    Recipe,
+    ShoppingCart,
+)
+from .search import create_search_indexes, update_search_vector
+
+User = get_user_model()
+
+COUNTERS = {Favorite: "favorites_count", ShoppingCart: "in_carts_count"}
+
+
+def change_counter(queryset, field, delta):
+    """Меняет счётчик на delta в базе, не опуская его ниже нуля."""
+    queryset.update(**{field: Greatest(F(field) + delta, 0)})
+
+
+@receiver(post_save, sender=Recipe)
+def process_image(instance, **kwargs):
+    if instance.image and instance.rendered_image != instance.image.name:
+        transaction.on_commit(lambda: schedule_recipe_image(instance))
+
+
+@receiver(post_save, sender=Recipe)
+def add_to_feeds(instance, created, **kwargs):
+    if created and is_fanned_out(instance.author):
+        fan_out(instance)
+
+
+@receiver(post_save, sender=Recipe)
+def increase_recipes_count(instance, created, **kwargs):
+    if created:
+        change_counter(
+            User.objects.filter(id=instance.author_id), "recipes_count", 1
+        )
+
+
+@receiver(post_delete, sender=Recipe)
+def decrease_recipes_count(instance, **kwargs):
+    change_counter(
+        User.objects.filter(id=instance.author_id), "recipes_count", -1
+    )
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+def increase_recipe_counter(sender, instance, created, **kwargs):
+    if created:
+        change_counter(
+            Recipe.objects.filter(id=instance.recipe_id), COUNTERS[sender], 1
+        )
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+def decrease_recipe_counter(sender, instance, **kwargs):
+    change_counter(
+        Recipe.objects.filter(id=instance.recipe_id), COUNTERS[sender], -1
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def update_recipe_search(instance, **kwargs):
+    update_search_vector(Recipe.objects.filter(id=instance.id))
+
+
+@receiver(post_save, sender=IngredientRecipe)
+@receiver(post_delete, sender=IngredientRecipe)
+def update_ingredient_recipe_search(instance, **kwargs):
+    update_search_vector(Recipe.objects.filter(id=instance.recipe_id))
+
+
+@receiver(post_save, sender=Ingredient)
+def update_ingredient_search(instance, created, **kwargs):
+    if not created:
+        update_search_vector(Recipe.objects.filter(ingredients=instance))
+
+
+@receiver(post_migrate)
+def create_indexes(sender, using, **kwargs):
+    if sender.name == "recipes":
+        create_search_indexes(using)
@@ -17,6 +17,15 @@ class User(AbstractUser):
     )
     first_name = models.CharField("Имя", max_length=150)
     last_name = models.CharField("Фамилия", max_length=150)
+    recipes_count = models.PositiveIntegerField(
+        "Количество рецептов", default=0, editable=False
+    )
+    followers_count = models.PositiveIntegerField(
+        "Количество подписчиков", default=0, editable=False
+    )
+    feed_fanned_out = models.BooleanField(
+        "Рецепты рассылаются по лентам", default=True, editable=False
+    )
 
     class Meta:
         ordering = ("username",)
@@ -0,0 +1,36 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from recipes.feed import backfill, remove_author, stop_fan_out
+from recipes.signals import change_counter
+
+from .models import Follow, User
+
+
+@receiver(post_save, sender=Follow)
+def increase_followers_count(instance, created, **kwargs):
+    if created:
+        change_counter(
+            User.objects.filter(id=instance.author_id), "followers_count", 1
+        )
+
+
+@receiver(post_delete, sender=Follow)
+def decrease_followers_count(instance, **kwargs):
+    change_counter(
+        User.objects.filter(id=instance.author_id), "followers_count", -1
+    )
+
+
+@receiver(post_save, sender=Follow)
+def add_author_to_feed(instance, created, **kwargs):
+    if created:
+        backfill([instance.user_id], instance.author_id)
+        stop_fan_out([instance.author_id])
+
+
+@receiver(post_delete, sender=Follow)
+def remove_author_from_feed(instance, **kwargs):
+    # Рассылку автору, у которого стало меньше подписчиков, возобновляет
+    # команда refresh_feeds, а не этот запрос.
+    remove_author(instance.user_id, instance.author_id)